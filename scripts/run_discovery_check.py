@@ -10,7 +10,7 @@ import sys
 import platform
 import tempfile
 from pathlib import Path
-from typing import List
+from typing import Dict, List
 
 # Ensure the project src/ is on sys.path so this script can be run from repo root.
 # Insert absolute repo_root/src at sys.path[0] before importing blink_stitch.
@@ -28,49 +28,61 @@ except Exception as e:
 
 
 def make_files(paths: List[Path]) -> None:
+    # one mkdir per unique parent, then create each empty file (deterministic content)
+    for parent in {p.parent for p in paths}:
+        parent.mkdir(parents=True, exist_ok=True)
     for p in paths:
-        p.parent.mkdir(parents=True, exist_ok=True)
-        # create an empty file (deterministic content)
-        p.write_bytes(b"")  # minimal dummy file
+        p.touch(exist_ok=True)  # minimal dummy file
 
 
-def layout_month_day_camera(root: Path) -> List[Path]:
+def _normalize(p: str, cache: Dict[str, str]) -> str:
+    # base is resolved once and the synthetic tree has no symlinks, so a pure
+    # string normalization matches Path.resolve() without stat'ing each component
+    out = cache.get(p)
+    if out is None:
+        out = cache[p] = os.path.abspath(os.path.normpath(p))
+    return out
+
+
+def layout_month_day_camera(root: Path) -> List[str]:
     # root/2024-01/2024-01-01/cam1/video1.mp4
     # root/2024-02/2024-02-02/cam2/video2.MP4
     p1 = root / "2024-01" / "2024-01-01" / "cam1" / "video1.mp4"
     p2 = root / "2024-02" / "2024-02-02" / "cam2" / "video2.MP4"
     make_files([p1, p2])
-    return [p1.resolve(), p2.resolve()]
+    return [str(p1), str(p2)]
 
 
-def layout_day_only(root: Path) -> List[Path]:
+def layout_day_only(root: Path) -> List[str]:
     # root/2024-01-01/videoA.mp4
     p1 = root / "2024-01-01" / "videoA.mp4"
     make_files([p1])
-    return [p1.resolve()]
+    return [str(p1)]
 
 
-def layout_flat(root: Path) -> List[Path]:
+def layout_flat(root: Path) -> List[str]:
     # root/video_flat.mov
     p1 = root / "video_flat.mov"
     make_files([p1])
-    return [p1.resolve()]
+    return [str(p1)]
 
 
-def layout_mixed(root: Path) -> List[Path]:
+def layout_mixed(root: Path) -> List[str]:
     # root/video_top.mp4, root/nested/cam/video_nested.MP4
     p1 = root / "video_top.mp4"
     p2 = root / "nested" / "cam" / "video_nested.MP4"
     make_files([p1, p2])
-    return [p1.resolve(), p2.resolve()]
+    return [str(p1), str(p2)]
 
 
 def run_check_for_layout(layout_name: str, create_fn):
     results = []
     with tempfile.TemporaryDirectory() as td:
-        base = Path(td).resolve()
+        # layouts build their paths under the resolved base, so they are already absolute
+        base = os.path.realpath(td)
+        normalized: Dict[str, str] = {}
         try:
-            expected_files = create_fn(base)
+            expected_files = create_fn(Path(base))
         except Exception as e:
             # Creation error
             results.append(
@@ -98,9 +110,10 @@ def run_check_for_layout(layout_name: str, create_fn):
                 results.append(json_obj)
                 continue
             try:
-                found = discover_media_paths([str(base)], recursive=recursive)
+                found = discover_media_paths([base], recursive=recursive)
                 # normalize to absolute sorted list (deterministic)
-                resolved = sorted(str(Path(p).resolve()) for p in found)
+                resolved = [_normalize(str(p), normalized) for p in found]
+                resolved.sort()
                 json_obj["discovered"] = resolved
             except Exception as e:
                 json_obj["error"] = f"discover_media_paths_exception: {e}"
@@ -2,18 +2,36 @@
 blink_stitch package init.
 
 Expose a small public API surface while keeping implementation inside modules.
+Everything here is resolved lazily (PEP 562) so `import blink_stitch` does not
+pull in sklearn, faster_whisper, pyannote or torch until they are used.
 """
-from . import main as main
+import importlib
 
-from sklearn.cluster import DBSCAN
-from sklearn.preprocessing import normalize
-from sklearn.neighbors import NearestNeighbors
+# public name -> (module, attribute); attribute None means the module itself
+_LAZY = {
+    "main": (".main", None),
+    "DBSCAN": ("sklearn.cluster", "DBSCAN"),
+    "normalize": ("sklearn.preprocessing", "normalize"),
+    "NearestNeighbors": ("sklearn.neighbors", "NearestNeighbors"),
+    "FWModel": ("faster_whisper", "WhisperModel"),
+    "PyannotePipeline": ("pyannote.audio", "Pipeline"),
+    "PNA_Model": ("pyannote.audio", "Model"),
+    "PNA_Inference": ("pyannote.audio", "Inference"),
+    "PNA_Segment": ("pyannote.core", "Segment"),
+}
 
-from faster_whisper import WhisperModel as FWModel
-from pyannote.audio import Pipeline as PyannotePipeline
-from pyannote.audio import Model as PNA_Model
-from pyannote.audio import Inference as PNA_Inference
-from pyannote.core import Segment as PNA_Segment
+def __getattr__(name):
+    try:
+        mod_name, attr = _LAZY[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    mod = importlib.import_module(mod_name, __name__)
+    value = mod if attr is None else getattr(mod, attr)
+    globals()[name] = value
+    return value
 
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
 
-__all__ = ["main"]
+
+__all__ = list(_LAZY)
@@ -3,22 +3,178 @@
 Annotation functions for Blink multicam stitching.
 """
 
-from typing import Any, Dict, List
-import math, numpy as np, pandas as pd
+from typing import Any, Dict, List, Optional, Tuple
+import os, math, numpy as np, pandas as pd
 from collections import defaultdict
+from .helpers import load_wav_cached, clip_stem, ensure_dir
 
 try:
     import opensmile
     HAVE_OPENSMILE = True
 except ImportError:
     opensmile = None
+    HAVE_OPENSMILE = False
 
-def compute_paralinguistics(turns: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+try:
+    import librosa
+    HAVE_LIBROSA = True
+except ImportError:
+    librosa = None
+    HAVE_LIBROSA = False
+
+try:
+    import bottleneck as bn
+    HAVE_BOTTLENECK = True
+except ImportError:
+    bn = None
+    HAVE_BOTTLENECK = False
+
+try:
+    from numba import njit, prange
+    HAVE_NUMBA = True
+except ImportError:
+    njit = prange = None
+    HAVE_NUMBA = False
+
+# NaN-aware reductions; bottleneck's kernels avoid numpy's _replace_nan copy
+_nanmean = bn.nanmean if HAVE_BOTTLENECK else np.nanmean
+_nanstd = bn.nanstd if HAVE_BOTTLENECK else np.nanstd
+_nansum = bn.nansum if HAVE_BOTTLENECK else np.nansum
+
+def _window_stats(v: np.ndarray) -> Tuple[float, float, float, float]:
+    """(mean, std, p05, p95) of a flat float array, ignoring NaNs."""
+    if np.isnan(v).any():
+        p05, p95 = np.nanpercentile(v,[5,95])
+        return float(_nanmean(v)), float(_nanstd(v)), float(p05), float(p95)
+    p05, p95 = np.percentile(v,[5,95])
+    return float(v.mean()), float(v.std()), float(p05), float(p95)
+
+if HAVE_NUMBA:
+    @njit(cache=True)
+    def _percentile_sorted(x, n, q):
+        # numpy's default "linear" interpolation over the first n sorted values
+        pos = q * (n - 1)
+        k = int(np.floor(pos))
+        if k + 1 >= n:
+            return x[n - 1]
+        return x[k] + (pos - k) * (x[k + 1] - x[k])
+
+    # fastmath is left off on purpose: it lets LLVM assume no NaNs and drop the isnan checks
+    @njit(parallel=True, cache=True)
+    def _agg_windows_nb(arr, lo, hi, col_idx):
+        out = np.full((len(lo), 4), np.nan)
+        for r in prange(len(lo)):
+            buf = np.empty((hi[r] - lo[r]) * len(col_idx))
+            n = 0
+            for i in range(lo[r], hi[r]):
+                for c in col_idx:
+                    x = arr[i, c]
+                    if not np.isnan(x):
+                        buf[n] = x
+                        n += 1
+            if n == 0:
+                continue
+            # Welford running mean / population variance
+            mean = 0.0
+            m2 = 0.0
+            for k in range(n):
+                d = buf[k] - mean
+                mean += d / (k + 1)
+                m2 += d * (buf[k] - mean)
+            vals = np.sort(buf[:n])
+            out[r, 0] = mean
+            out[r, 1] = np.sqrt(m2 / n)
+            out[r, 2] = _percentile_sorted(vals, n, 0.05)
+            out[r, 3] = _percentile_sorted(vals, n, 0.95)
+        return out
+
+def _agg_windows(arr: np.ndarray, lo: np.ndarray, hi: np.ndarray, col_idx: np.ndarray) -> np.ndarray:
+    """
+    Per-window (mean, std, p05, p95) over arr[lo[r]:hi[r], col_idx], NaN-aware.
+    Returns an (n_windows, 4) array; rows are NaN for empty or all-NaN windows.
+    Runs as a parallel Numba kernel when numba is installed.
+    """
+    if HAVE_NUMBA:
+        return _agg_windows_nb(arr, lo, hi, col_idx)
+    out = np.full((len(lo), 4), np.nan)
+    for r in range(len(lo)):
+        if hi[r] > lo[r]:
+            v = arr[lo[r]:hi[r], col_idx].reshape(-1)
+            if not np.isnan(v).all():
+                out[r] = _window_stats(v)
+    return out
+
+def _compute_mfcc_only(turns: List[Dict[str, Any]], n_mfcc: int = 20, hop_length: int = 160) -> List[Dict[str, Any]]:
+    """
+    librosa fallback for compute_paralinguistics: per-turn MFCC means only (the voice
+    fingerprint part); F0/loudness/jitter/shimmer derived fields are left empty.
+    """
+    by_clip: Dict[str,List[int]] = defaultdict(list)
+    for i,t in enumerate(turns):
+        by_clip[t["clip_path"]].append(i)
+
+    for clip_path, idxs in by_clip.items():
+        wav = turns[idxs[0]].get("wav_path")
+        if wav and os.path.exists(wav):
+            # reuse the 16k mono WAV cached by process_one_clip
+            y, sr = load_wav_cached(wav)
+        else:
+            y, sr = librosa.load(clip_path, sr=16000, mono=True)
+        mf = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=n_mfcc, hop_length=hop_length)
+        t_np = librosa.times_like(mf, sr=sr, hop_length=hop_length)
+        for i in idxs:
+            t = turns[i]
+            lo = int(np.searchsorted(t_np, t["start"], side="left"))
+            hi = int(np.searchsorted(t_np, t["end"], side="right"))
+            mfcc_means = mf[:, lo:hi].mean(axis=1).tolist() if hi > lo else None
+            t["paralinguistics"] = {
+                "f0": {},
+                "loudness": {},
+                "jitter": {},
+                "shimmer": {},
+                "inflection": None,
+                "mfcc_means": mfcc_means,
+                "snr_proxy": None,
+                "mood_tags": [],
+                "note": "opensmile not installed; MFCC features via librosa only",
+            }
+    return turns
+
+def _clip_lld(smile_lld, clip_path: str, cache_dir: Optional[str]) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """
+    (frame start times, float32 LLD values, column names) for one clip. With a cache_dir
+    the result is memoized to <cache_dir>/<stem>.lld.npz, since it depends only on the audio.
+    """
+    cache = os.path.join(cache_dir, f"{clip_stem(clip_path)}.lld.npz") if cache_dir else None
+    if cache and os.path.exists(cache):
+        with np.load(cache) as z:
+            return z["times"], z["values"], [str(c) for c in z["columns"]]
+
+    lld = smile_lld().process_file(clip_path)  # time-indexed LLD dataframe
+    # frame start times in seconds, converted in one vectorized cast
+    if isinstance(lld.index, pd.MultiIndex):
+        lvl = lld.index.get_level_values("start" if "start" in lld.index.names else -1)
+        t_np = (lvl.total_seconds() if hasattr(lvl, "total_seconds") else lvl).to_numpy(dtype=np.float32)
+    else:
+        # fallback 10ms hop assumption
+        t_np = np.arange(len(lld), dtype=np.float32) * np.float32(0.01)
+    arr = lld.values.astype(np.float32, copy=False)
+    cols = [str(c) for c in lld.columns]
+    if cache:
+        ensure_dir(cache_dir)
+        np.savez(cache, times=t_np, values=arr, columns=np.array(cols, dtype=str))
+    return t_np, arr, cols
+
+def compute_paralinguistics(turns: List[Dict[str, Any]], cache_dir: Optional[str] = None) -> List[Dict[str, Any]]:
     """
     Attach paralinguistic features per turn using opensmile (eGeMAPS LLDs) aggregated.
     Also compute rough SNR and intonation/inflection heuristics from F0 statistics.
-    Requires opensmile. If missing, annotate minimal features.
+    Requires opensmile. If missing, fall back to librosa MFCC means when available,
+    otherwise annotate minimal features. If cache_dir is given, per-clip LLDs are
+    cached there and reused across runs.
     """
+    if not HAVE_OPENSMILE and HAVE_LIBROSA:
+        return _compute_mfcc_only(turns)
     if not HAVE_OPENSMILE:
         for t in turns:
             t["paralinguistics"] = {"note": "opensmile not installed; minimal features only"}
@@ -29,95 +185,115 @@ def compute_paralinguistics(turns: List[Dict[str, Any]]) -> List[Dict[str, Any]]
     for i,t in enumerate(turns):
         by_clip[t["clip_path"]].append(i)
 
-    smile_lld = opensmile.Smile(
-        feature_set=opensmile.FeatureSet.eGeMAPSv02,
-        feature_level=opensmile.FeatureLevel.LowLevelDescriptors,
-    )
+    smile: List[Any] = []
+    def smile_lld():
+        # built on first cache miss only
+        if not smile:
+            smile.append(opensmile.Smile(
+                feature_set=opensmile.FeatureSet.eGeMAPSv02,
+                feature_level=opensmile.FeatureLevel.LowLevelDescriptors,
+            ))
+        return smile[0]
 
     for clip_path, idxs in by_clip.items():
-        # process once per clip
-        lld = smile_lld.process_file(clip_path)  # time-indexed LLD dataframe
-        # time index (MultiIndex file,time) -> seconds array
-        if isinstance(lld.index, pd.MultiIndex):
-            times = [float(t) for _, t in lld.index]
-        else:
-            # fallback 10ms hop assumption
-            times = [i*0.01 for i in range(len(lld))]
+        # process once per clip (or read the LLD cached by a previous run)
+        t_np, arr, cols = _clip_lld(smile_lld, clip_path, cache_dir)
 
         # map column names of interest
-        cols = lld.columns
-        def col_like(keys): return [c for c in cols if any(k.lower() in c.lower() for k in keys)]
-        f0_cols = col_like(["F0", "f0"])
-        loud_cols = col_like(["loudness"])
-        jitter_cols = col_like(["jitter"])
-        shimmer_cols = col_like(["shimmer"])
-        mfcc_cols = col_like(["mfcc"])
-
-        arr = lld.to_numpy(dtype=np.float32)
-
-        # helper to slice by time
-        t_np = np.array(times, dtype=np.float32)
-        def slice_stats(a,b, col_idx):
-            mask = (t_np >= a) & (t_np <= b)
-            if not np.any(mask) or len(col_idx)==0:
+        cols_lower = [c.lower() for c in cols]
+        def col_like(keys):
+            keys = [k.lower() for k in keys]
+            return np.fromiter((j for j, c in enumerate(cols_lower) if any(k in c for k in keys)), dtype=np.intp)
+        # column indices per feature group, resolved once per clip
+        f0_idx = col_like(["f0"])
+        loud_idx = col_like(["loudness"])
+        jitter_idx = col_like(["jitter"])
+        shimmer_idx = col_like(["shimmer"])
+        mfcc_idx = col_like(["mfcc"])
+
+        # helper to slice by time; frame times are monotonically increasing so
+        # [a,b] maps to a contiguous row range found by binary search
+        def window(a,b):
+            lo = int(np.searchsorted(t_np, a, side="left"))
+            hi = int(np.searchsorted(t_np, b, side="right"))
+            return lo, hi
+        def slice_stats(lo,hi, col_idx):
+            if hi <= lo or len(col_idx)==0:
                 return None
-            sub = arr[mask][:, col_idx]
+            sub = arr[lo:hi, col_idx]
             return sub
+        def loud_sum_count(lo,hi):
+            if hi <= lo or len(loud_idx)==0:
+                return 0.0, 0
+            v = arr[lo:hi, loud_idx]
+            return float(_nansum(v)), int(np.count_nonzero(~np.isnan(v)))
 
-        for i in idxs:
+        # window bounds for every turn of this clip, then one aggregation pass per feature group
+        t_start = np.array([turns[i]["start"] for i in idxs], dtype=np.float64)
+        t_end = np.array([turns[i]["end"] for i in idxs], dtype=np.float64)
+        lo_all = np.searchsorted(t_np, t_start, side="left").astype(np.intp)
+        hi_all = np.searchsorted(t_np, t_end, side="right").astype(np.intp)
+        def group_stats(col_idx):
+            if len(col_idx)==0:
+                return None
+            return _agg_windows(arr, lo_all, hi_all, col_idx)
+        f0_agg, loud_agg = group_stats(f0_idx), group_stats(loud_idx)
+        jitter_agg, shimmer_agg = group_stats(jitter_idx), group_stats(shimmer_idx)
+
+        for k, i in enumerate(idxs):
             t = turns[i]
             s, e = t["start"], t["end"]
-            # F0 & loudness stats
-            f0_sub = slice_stats(s,e,[cols.get_loc(c) for c in f0_cols])
-            loud_sub = slice_stats(s,e,[cols.get_loc(c) for c in loud_cols])
-            jit_sub = slice_stats(s,e,[cols.get_loc(c) for c in jitter_cols])
-            shm_sub = slice_stats(s,e,[cols.get_loc(c) for c in shimmer_cols])
-            mfcc_sub= slice_stats(s,e,[cols.get_loc(c) for c in mfcc_cols])
-
-            def stats(mat):
-                if mat is None or mat.size==0:
+            lo, hi = int(lo_all[k]), int(hi_all[k])
+            # F0 and MFCC frames for the trace/summary features
+            f0_sub = slice_stats(lo,hi,f0_idx)
+            mfcc_sub= slice_stats(lo,hi,mfcc_idx)
+
+            def stats(agg):
+                if agg is None or hi <= lo:
                     return {}
-                v = np.nan_to_num(mat, nan=np.nan)
-                mean = float(np.nanmean(v))
-                std  = float(np.nanstd(v))
-                p95  = float(np.nanpercentile(v,95))
-                p05  = float(np.nanpercentile(v,5))
+                mean, std, p05, p95 = (float(x) for x in agg[k])
                 return {"mean":mean,"std":std,"p95":p95,"p05":p05}
 
-            f0_stats = stats(f0_sub)
-            loud_stats = stats(loud_sub)
-            jitter_stats = stats(jit_sub)
-            shimmer_stats= stats(shm_sub)
+            f0_stats = stats(f0_agg)
+            loud_stats = stats(loud_agg)
+            jitter_stats = stats(jitter_agg)
+            shimmer_stats= stats(shimmer_agg)
 
             # intonation/inflection proxy: slope of F0 over time (linear fit on mean of f0 cols)
             inflection = None
             if f0_sub is not None and f0_sub.size>0:
-                f0_trace = np.nanmean(f0_sub, axis=1)
-                tt = t_np[(t_np>=s)&(t_np<=e)]
-                if len(tt)>=2:
-                    A = np.vstack([tt, np.ones_like(tt)]).T
-                    m, c = np.linalg.lstsq(A, f0_trace, rcond=None)[0]
-                    inflection = {"slope_hz_per_s": float(m), "range_hz": float(np.nanmax(f0_trace)-np.nanmin(f0_trace))}
+                f0_trace = _nanmean(f0_sub, axis=1)
+                valid = ~np.isnan(f0_trace)
+                if np.count_nonzero(valid)>=2:
+                    # closed-form least-squares slope: cov(t, f0) / var(t)
+                    tt, ff = t_np[lo:hi][valid], f0_trace[valid]
+                    tc = tt - tt.mean()
+                    m = np.dot(tc, ff - ff.mean()) / (np.dot(tc, tc) + 1e-9)
+                    inflection = {"slope_hz_per_s": float(m), "range_hz": float(ff.max()-ff.min())}
             # MFCC summary (voice "fingerprint" features – good for cloning packs)
             mfcc_means = None
             if mfcc_sub is not None and mfcc_sub.size>0:
-                mfcc_means = np.nanmean(mfcc_sub, axis=0).tolist()
+                mfcc_means = _nanmean(mfcc_sub, axis=0).tolist()
 
             # rough SNR proxy: loudness in-turn vs adjacent 0.5s margins if available
             snr = None
-            if loud_sub is not None and loud_sub.size>0:
-                L_in = float(np.nanmean(loud_sub))
-                pre = slice_stats(max(0.0,s-0.5), s, [cols.get_loc(c) for c in loud_cols])
-                post= slice_stats(e, e+0.5, [cols.get_loc(c) for c in loud_cols])
-                L_out = float(np.nanmean(np.vstack([x for x in [pre,post] if x is not None])) if (pre is not None or post is not None) else np.nan)
+            if loud_stats:
+                L_in = loud_stats["mean"]
+                # pooled NaN-aware mean over both margins without concatenating them
+                pre_sum, pre_n = loud_sum_count(*window(max(0.0,s-0.5), s))
+                post_sum, post_n = loud_sum_count(*window(e, e+0.5))
+                L_out = (pre_sum + post_sum) / (pre_n + post_n) if (pre_n + post_n) else np.nan
                 if not math.isnan(L_in) and not math.isnan(L_out):
                     snr = float(L_in - L_out)  # in arbitrary loudness units
 
             # fast heuristics for mood tags (keep simple, transparent)
+            f0_std = f0_stats.get("std",0.0)
+            loud_mean = loud_stats.get("mean",0.0)
+            f0_range = f0_stats.get("p95",0.0) - f0_stats.get("p05",0.0)
             mood = []
-            if f0_stats.get("std",0)>15 and loud_stats.get("mean",0)>0: mood.append("energetic/excited")
-            if f0_stats.get("std",0)<5 and loud_stats.get("mean",0)<0: mood.append("calm/flat")
-            if (t["text"].count("!")>=1) or (f0_stats.get("p95",0)-f0_stats.get("p05",0)>60): mood.append("emphatic")
+            if f0_std>15 and loud_mean>0: mood.append("energetic/excited")
+            elif f0_std<5 and loud_mean<0: mood.append("calm/flat")
+            if f0_range>60 or "!" in t["text"]: mood.append("emphatic")
 
             t["paralinguistics"] = {
                 "f0": f0_stats,
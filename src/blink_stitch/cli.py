@@ -5,15 +5,17 @@ Console entry point for blink-stitch.
 This CLI parses a few lightweight flags related to input discovery and
 maps them into the application's configuration before the runner is created.
 """
-from typing import List, Optional
+from typing import FrozenSet, List, Optional
 import argparse
-# Local import to avoid heavy imports at module import time
-from .main import BlinkMulticameraStitch, DEFAULT_CONFIG_PATH
 
-def _parse_extensions(exts: Optional[str]):
+def _parse_extensions(exts: Optional[str]) -> Optional[FrozenSet[str]]:
+    """
+    Parse "mp4, .WAV" into a frozenset of lower-case, leading-dot extensions ({".mp4", ".wav"}).
+    The frozenset marks the value as pre-normalized for discover_media_paths.
+    """
     if not exts:
         return None
-    return [e.strip() for e in exts.split(",") if e.strip()]
+    return frozenset("." + e.strip().lstrip(".").lower() for e in exts.split(",") if e.strip()) or None
 
 def main(argv: Optional[List[str]] = None):
     """
@@ -23,6 +25,7 @@ def main(argv: Optional[List[str]] = None):
       -i, --input-path  (repeatable) : path to file or directory to discover media in
       --recursive / --no-recursive   : whether discovery should be recursive (default: True)
       --extensions                    : comma-separated list of extensions -> config["video_extensions"]
+                                        (stored as a pre-normalized frozenset, e.g. {".mp4", ".wav"})
 
     If argv is provided, it is parsed instead of sys.argv.
     """
@@ -36,6 +39,9 @@ def main(argv: Optional[List[str]] = None):
 
     args = parser.parse_args(argv)
 
+    # Local import to avoid heavy imports at module import time; -h/--help exits above
+    from .main import BlinkMulticameraStitch, DEFAULT_CONFIG_PATH
+
     config_path = args.config if args.config is not None else DEFAULT_CONFIG_PATH
 
     # Instantiate application
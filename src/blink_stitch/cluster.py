@@ -3,16 +3,19 @@
 Clustering functions for Blink multicam stitching.
 """
 
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 import os, numpy as np
-import gc
 from loguru import logger
 from sklearn.cluster import DBSCAN
 from sklearn.preprocessing import normalize
 from sklearn.neighbors import NearestNeighbors
-from .helpers import ensure_dir, HAVE_HDBSCAN, clip_to_segment_wav, sh, torch
+from scipy.sparse import csr_matrix
+import torch
+import torchaudio
+from .helpers import ensure_dir, HAVE_HDBSCAN, HAVE_AV, clip_to_segment_wav, clip_to_segment_pcm, decode_segment_16k_mono, load_wav_cached, sh, load_embs, device_hint
 import soundfile as sf
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from speechbrain.inference.classifiers import EncoderClassifier
 
 try:
@@ -22,13 +25,6 @@ except ImportError:
     hdbscan = None
     pass
 
-try:
-    import librosa
-    HAVE_LIBROSA = True
-except ImportError:
-    librosa = None
-    pass
-
 # Limit thread usage for native libraries to reduce mutex contention
 os.environ["OMP_NUM_THREADS"] = "1"
 os.environ["MKL_NUM_THREADS"] = "1"
@@ -37,23 +33,103 @@ if hasattr(torch, "set_num_threads"):
 if hasattr(torch, "set_num_interop_threads"):
     torch.set_num_interop_threads(1)
 
-def auto_eps_knn(Xn: np.ndarray, k: int = 5, quantile: float = 0.90) -> float:
+def fit_neighbors(Xn: np.ndarray) -> NearestNeighbors:
+    """
+    Cosine neighbor index shared by auto_eps_knn and run_dbscan. Brute force on
+    normalized embeddings is a BLAS matrix product.
+    """
     logger.info("Starting NearestNeighbors.fit")
-    nbrs = NearestNeighbors(n_neighbors=min(k, len(Xn))).fit(Xn)
+    nbrs = NearestNeighbors(metric="cosine", algorithm="brute").fit(Xn)
     logger.info("Finished NearestNeighbors.fit")
-    dists, _ = nbrs.kneighbors(Xn)
+    return nbrs
+
+def auto_eps_knn(Xn: np.ndarray, k: int = 5, quantile: float = 0.90,
+                 nbrs: Optional[NearestNeighbors] = None) -> float:
+    if nbrs is None:
+        nbrs = fit_neighbors(Xn)
+    dists, _ = nbrs.kneighbors(Xn, n_neighbors=min(k, len(Xn)))
     kth = dists[:, -1]
     logger.info("Computed kth distances, quantile next")
     return float(np.quantile(kth, quantile))
 
-def run_dbscan(Xn: np.ndarray, eps: float, min_samples: int) -> np.ndarray:
-    logger.info("Creating DBSCAN model")
-    model = DBSCAN(eps=eps, min_samples=min_samples, metric="cosine", n_jobs=-1)
-    logger.info("Fitting DBSCAN model")
-    result = model.fit_predict(Xn)
+def eps_graph(Xn: np.ndarray, eps: float, tile: int = 4096) -> csr_matrix:
+    """
+    Sparse cosine-distance graph of pairs within eps, for L2-normalized rows. Distances are
+    1 - Xn @ Xn.T, computed in row tiles so memory stays at tile * n.
+    """
+    X = np.ascontiguousarray(Xn, dtype=np.float32)
+    n = len(X)
+    blocks = []
+    for a in range(0, n, tile):
+        D = 1.0 - X[a:a + tile] @ X.T
+        np.maximum(D, 0.0, out=D)
+        r, c = np.nonzero(D <= eps)
+        # keep exact duplicates as stored entries rather than implicit zeros
+        blocks.append((r + a, c, np.maximum(D[r, c], 1e-12)))
+    rows, cols, data = (np.concatenate(x) for x in zip(*blocks)) if blocks else ([], [], [])
+    return csr_matrix((data, (rows, cols)), shape=(n, n))
+
+def run_dbscan(Xn: np.ndarray, eps: float, min_samples: int,
+               nbrs: Optional[NearestNeighbors] = None) -> np.ndarray:
+    """
+    DBSCAN with cosine distance, run on a precomputed sparse eps-graph. The graph comes from
+    `nbrs` (see fit_neighbors) when given, else from eps_graph.
+    """
+    if nbrs is None:
+        logger.info("Building eps-neighbor graph")
+        G = eps_graph(Xn, eps)
+    else:
+        logger.info("Building radius neighbors graph")
+        G = nbrs.radius_neighbors_graph(Xn, radius=eps, mode="distance")
+    logger.info("Fitting DBSCAN model on precomputed graph")
+    result = DBSCAN(eps=eps, min_samples=min_samples, metric="precomputed", n_jobs=-1).fit_predict(G)
     logger.info("DBSCAN fit_predict complete")
     return result
 
+def run_sdbscan(Xn: np.ndarray, eps: float, min_samples: int,
+                n_proj: int = 32, top_k: int = 10, n_axes: int = 4, seed: int = 0) -> np.ndarray:
+    """
+    Approximate cosine DBSCAN via random-projection neighbor sampling (sDBSCAN-style).
+
+    Each of `n_proj` Gaussian directions keeps its `top_k` highest- and lowest-projected
+    points. A point's candidate neighbors are the points listed for the `n_axes`
+    directions it projects onto most strongly (on the side of its sign). Only candidate
+    pairs get an exact cosine check; pairs within eps form the sparse graph that DBSCAN
+    clusters as a precomputed metric. Cost is O(n * n_proj) plus O(n * n_axes * top_k)
+    pair checks, instead of all O(n^2) pairs.
+    """
+    n, d = Xn.shape
+    if n == 0:
+        return np.empty(0, dtype=int)
+    rng = np.random.default_rng(seed)
+    X = np.ascontiguousarray(Xn, dtype=np.float32)
+    P = X @ rng.standard_normal((d, n_proj)).astype(np.float32)
+    k, s = min(top_k, n), min(n_axes, n_proj)
+    # per direction, the k points at each extreme: bucket 2*j is the top side, 2*j+1 the bottom
+    lists = np.empty((2 * n_proj, k), dtype=np.intp)
+    lists[0::2] = np.argpartition(-P, k - 1, axis=0)[:k].T
+    lists[1::2] = np.argpartition(P, k - 1, axis=0)[:k].T
+    axes = np.argpartition(-np.abs(P), s - 1, axis=1)[:, :s]
+    bucket = 2 * axes + (np.take_along_axis(P, axes, axis=1) < 0)
+    rows, cols = [], []
+    for b in range(2 * n_proj):
+        members = np.flatnonzero((bucket == b).any(axis=1))
+        if len(members) == 0:
+            continue
+        # one GEMM per bucket: its members against the bucket's list
+        close = (X[members] @ X[lists[b]].T) >= 1.0 - eps
+        r, c = np.nonzero(close)
+        rows.append(members[r]); cols.append(lists[b][c])
+    rows = np.concatenate(rows); cols = np.concatenate(cols)
+    keep = rows != cols
+    rows, cols = rows[keep], cols[keep]
+    # DBSCAN only needs which pairs are within eps; a tiny stored distance stays <= eps
+    # even where csr_matrix sums duplicate pairs
+    data = np.full(2 * len(rows), 1e-9)
+    G = csr_matrix((data, (np.concatenate([rows, cols]), np.concatenate([cols, rows]))), shape=(n, n))
+    logger.info(f"sDBSCAN graph: {G.nnz} stored edges")
+    return DBSCAN(eps=eps, min_samples=min_samples, metric="precomputed", n_jobs=-1).fit_predict(G)
+
 def run_hdbscan(Xn: np.ndarray, min_cluster_size: int) -> np.ndarray:
     if not HAVE_HDBSCAN:
         raise RuntimeError("hdbscan not installed.")
@@ -69,38 +145,80 @@ def external_verifier_score(cmd_tmpl: str, wav1: str, wav2: str) -> float:
     p = sh(cmd)
     return float(p.stdout.strip().split()[0])
 
+_ECAPA = None
+
+def _get_ecapa():
+    """Load the ECAPA speaker classifier once per process."""
+    global _ECAPA
+    if _ECAPA is None:
+        logger.info("Loading EncoderClassifier")
+        _ECAPA = EncoderClassifier.from_hparams(source="speechbrain/spkrec-ecapa-voxceleb",
+                                                run_opts={"device": device_hint()})
+    return _ECAPA
+
+def _ecapa_prep(w: np.ndarray, fs: int) -> torch.Tensor:
+    """Mono float32 audio at 16 kHz for the ECAPA classifier."""
+    w = torch.from_numpy(np.array(w, dtype=np.float32))
+    if w.ndim > 1: w = w.mean(dim=1)
+    if fs != 16000:
+        # polyphase sinc resampling; downmix first so only one channel is filtered
+        w = torchaudio.functional.resample(w, fs, 16000, lowpass_filter_width=16)
+    return w
+
+def ecapa_embed_batch(wav_paths: List[str], batch_size: int = 32) -> torch.Tensor:
+    """L2-normalized ECAPA embeddings (N, D) for a list of WAVs."""
+    return ecapa_embed_signals([_ecapa_prep(*sf.read(p)) for p in wav_paths], batch_size)
+
+def ecapa_embed_signals(sigs: List[torch.Tensor], batch_size: int = 32) -> torch.Tensor:
+    """
+    L2-normalized ECAPA embeddings (N, D) for 16 kHz mono signals. Signals are length-sorted
+    and zero-padded into batches; wav_lens tells the classifier each signal's true length.
+    """
+    classifier = _get_ecapa()
+    order = sorted(range(len(sigs)), key=lambda i: len(sigs[i]))
+    out: List[Optional[torch.Tensor]] = [None] * len(sigs)
+    # fp16 forward pass on CUDA tensor cores; normalization and scoring stay in fp32
+    use_fp16 = torch.cuda.is_available()
+    with torch.inference_mode():
+        for k in range(0, len(order), batch_size):
+            idx = order[k:k + batch_size]
+            batch = torch.nn.utils.rnn.pad_sequence([sigs[i] for i in idx], batch_first=True)
+            lens = torch.tensor([len(sigs[i]) for i in idx], dtype=torch.float32)
+            with torch.autocast(device_type="cuda", dtype=torch.float16, enabled=use_fp16):
+                embs = classifier.encode_batch(batch, lens / lens.max()).squeeze(1)
+            embs = torch.nn.functional.normalize(embs.float(), dim=-1).cpu()
+            for i, e in zip(idx, embs):
+                out[i] = e
+    return torch.stack(out)
+
 def ecapa_embed_and_score(wav_a: str, wav_b: str) -> float:
-    logger.info("Loading EncoderClassifier")
-    classifier = EncoderClassifier.from_hparams(source="speechbrain/spkrec-ecapa-voxceleb")
-    logger.info("Reading wav_a and wav_b with soundfile")
-    wa, fsa = sf.read(wav_a); wb, fsb = sf.read(wav_b)
-    def prep(w, fs):
-        logger.info(f"Preparing audio, fs={fs}")
-        if fs != 16000 and HAVE_LIBROSA:
-            logger.info("Resampling with librosa")
-            w = librosa.resample(w, orig_sr=fs, target_sr=16000)
-        if w.ndim > 1: w = w.mean(axis=1)
-        logger.info("Converting to torch tensor")
-        # Ensure minimal thread contention during tensor ops
-        if hasattr(torch, "set_num_threads"):
-            torch.set_num_threads(1)
-        if hasattr(torch, "set_num_interop_threads"):
-            torch.set_num_interop_threads(1)
-        return torch.tensor(w[None, :], dtype=torch.float32)
-    logger.info("Encoding batch for wa")
-    ea = classifier.encode_batch(prep(wa, fsa)).mean(1)
-    logger.info("Encoding batch for wb")
-    eb = classifier.encode_batch(prep(wb, fsb)).mean(1)
-    logger.info("Normalizing embeddings")
-    # Normalize embeddings with minimal thread contention
-    ea = torch.nn.functional.normalize(ea, dim=-1)
-    eb = torch.nn.functional.normalize(eb, dim=-1)
-    logger.info("Computing similarity score")
-    # Compute similarity score with minimal thread contention
-    score = float(torch.sum(ea * eb).item())
-    # Explicit resource cleanup
-    gc.collect()
-    return score
+    embs = ecapa_embed_batch([wav_a, wav_b])
+    return float(torch.sum(embs[0] * embs[1]).item())
+
+def _cut_segments(turns: List[Dict[str, Any]], seg_ids: List[int], seg_cache_dir: str) -> Dict[int, str]:
+    """
+    Ensure seg_<i>.wav exists for each turn index, running the missing ffmpeg cuts
+    concurrently (each is its own process, so threads overlap them). Returns {i: path}.
+    """
+    seg_wavs = {i: os.path.join(seg_cache_dir, f"seg_{i}.wav") for i in seg_ids}
+    todo = [(turns[i]["clip_path"], turns[i]["start"], turns[i]["end"], w) for i, w in seg_wavs.items() if not os.path.exists(w)]
+    if todo:
+        with ThreadPoolExecutor(max_workers=min(len(todo), os.cpu_count() or 1)) as ex:
+            list(ex.map(lambda args: clip_to_segment_wav(*args), todo))
+    return seg_wavs
+
+def _segment_signal(turn: Dict[str, Any]) -> torch.Tensor:
+    """
+    16 kHz mono audio for a turn, avoiding an ffmpeg run where possible: slice the clip's cached
+    16 kHz WAV, else decode the span in-process with PyAV, else pipe PCM out of ffmpeg.
+    """
+    wav = turn.get("wav_path")
+    if wav and os.path.exists(wav):
+        samples, sr = load_wav_cached(wav)
+        return _ecapa_prep(samples[int(turn["start"] * sr):int(turn["end"] * sr)], sr)
+    if HAVE_AV:
+        return torch.from_numpy(decode_segment_16k_mono(turn["clip_path"], turn["start"], turn["end"]).copy())
+    return torch.from_numpy(clip_to_segment_pcm(turn["clip_path"], turn["start"], turn["end"]))
 
 def refine_by_verification(turns: List[Dict[str, Any]],
                            labels: np.ndarray,
@@ -108,26 +226,29 @@ def refine_by_verification(turns: List[Dict[str, Any]],
                            score_mode: str,
                            score_threshold: float,
                            max_pairs: int,
-                           external_cmd: Optional[str]) -> np.ndarray:
+                           external_cmd: Optional[str],
+                           Xn: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Merge cluster pairs whose sampled segments verify as the same speaker.
+    Xn, when given, is the L2-normalized embedding matrix already used for clustering;
+    otherwise it is loaded from the turns and normalized here.
+    """
     clusters = defaultdict(list)
     for i, lab in enumerate(labels):
         if lab == -1: continue
         clusters[int(lab)].append(i)
     if not clusters: return labels
 
-    X = np.vstack([np.array(t["emb"], dtype=np.float32) for t in turns])
-    Xn = normalize(X)
-    centroids = {c: normalize(np.mean(Xn[idxs], axis=0, keepdims=True))[0] for c, idxs in clusters.items()}
-
-    def cos(a,b): return float(np.dot(a,b))
-    cand = []
-    keys = sorted(centroids.keys())
-    for i in range(len(keys)):
-        for j in range(i+1, len(keys)):
-            c1, c2 = keys[i], keys[j]
-            s = cos(centroids[c1], centroids[c2])
-            if s >= 0.6:
-                cand.append((c1,c2,s))
+    if Xn is None: Xn = normalize(load_embs(turns))
+    keys = sorted(clusters.keys())
+    C = np.stack([Xn[clusters[c]].mean(axis=0) for c in keys])
+    C /= np.maximum(np.linalg.norm(C, axis=1, keepdims=True), 1e-12)
+    # all centroid cosines in one GEMM; candidates are the upper-triangle pairs >= 0.6
+    S = C @ C.T
+    iu, ju = np.triu_indices(len(keys), k=1)
+    sims = S[iu, ju]
+    m = sims >= 0.6
+    cand = [(keys[i], keys[j], float(v)) for i, j, v in zip(iu[m], ju[m], sims[m])]
     cand.sort(key=lambda x: -x[2])
 
     parent = {k:k for k in keys}
@@ -142,20 +263,44 @@ def refine_by_verification(turns: List[Dict[str, Any]],
 
     ensure_dir(seg_cache_dir)
     rng = np.random.default_rng(42)
+    # sample every candidate's pairs up front (same rng order as scoring pair by pair)
+    cand_pairs = []
     for c1,c2,_ in cand:
         a, b = clusters[c1], clusters[c2]
         if not a or not b: continue
-        pairs = [(int(rng.choice(a)), int(rng.choice(b))) for _ in range(max_pairs)]
-        scores = []
-        for (i,j) in pairs:
-            ti, tj = turns[i], turns[j]
-            wi = os.path.join(seg_cache_dir, f"seg_{i}.wav")
-            wj = os.path.join(seg_cache_dir, f"seg_{j}.wav")
-            if not os.path.exists(wi): clip_to_segment_wav(ti["clip_path"], ti["start"], ti["end"], wi)
-            if not os.path.exists(wj): clip_to_segment_wav(tj["clip_path"], tj["start"], tj["end"], wj)
-            s = ecapa_embed_and_score(wi, wj) if score_mode=="ecapa" else external_verifier_score(external_cmd, wi, wj)
-            scores.append(s)
-        if np.mean(scores) >= score_threshold:
+        cand_pairs.append((c1, c2, [(int(rng.choice(a)), int(rng.choice(b))) for _ in range(max_pairs)]))
+
+    seg_ids = list(dict.fromkeys(t for _, _, pairs in cand_pairs for pair in pairs for t in pair))
+    seg_wavs: Dict[int, str] = {}
+    pair_scores: Dict[Tuple[int, int], float] = {}
+    if score_mode == "ecapa" and seg_ids:
+        # embed each referenced segment once, in batches, from in-memory audio; pairs index the rows
+        row = {t: r for r, t in enumerate(seg_ids)}
+        if HAVE_AV:
+            sigs = [_segment_signal(turns[t]) for t in seg_ids]
+        else:
+            # segments without a cached clip WAV fall back to ffmpeg pipes; run those in parallel
+            with ThreadPoolExecutor(max_workers=min(len(seg_ids), os.cpu_count() or 1)) as ex:
+                sigs = list(ex.map(lambda t: _segment_signal(turns[t]), seg_ids))
+        embs = ecapa_embed_signals(sigs)
+    else:
+        # the external verifier takes file paths; resampled pairs repeat as max_pairs grows, so
+        # score each distinct pair once, running the verifier processes concurrently
+        seg_wavs = _cut_segments(turns, seg_ids, seg_cache_dir)
+        uniq = list(dict.fromkeys(pair for _, _, pairs in cand_pairs for pair in pairs))
+        if uniq:
+            with ThreadPoolExecutor(max_workers=min(len(uniq), os.cpu_count() or 1)) as ex:
+                pair_scores = dict(zip(uniq, ex.map(
+                    lambda pair: external_verifier_score(external_cmd, seg_wavs[pair[0]], seg_wavs[pair[1]]), uniq)))
+    for c1, c2, pairs in cand_pairs:
+        if not pairs: continue
+        if score_mode == "ecapa":
+            i_idx = torch.tensor([row[i] for i, _ in pairs]); j_idx = torch.tensor([row[j] for _, j in pairs])
+            mean_score = float((embs[i_idx] * embs[j_idx]).sum(-1).mean())
+        else:
+            # a handful of floats: plain Python beats building an array for np.mean
+            mean_score = sum(pair_scores[pair] for pair in pairs) / len(pairs)
+        if mean_score >= score_threshold:
             union(c1, c2)
 
     root_to_new = {}
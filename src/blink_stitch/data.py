@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Data models for Blink multicam stitching.
+"""
+
+from typing import Any, Dict, List, NamedTuple, Optional
+import numpy as np
+from .helpers import load_embs
+
+class TurnArrays(NamedTuple):
+    """Struct-of-arrays view over a list of turn dicts (row i <-> turns[i])."""
+    starts: np.ndarray            # float64 abs_start
+    ends: np.ndarray              # float64 abs_end
+    spk_ids: np.ndarray           # int32 index into spk_labels; -1 where spk_global is None
+    spk_labels: List[Any]         # distinct spk_global values
+    emb: Optional[np.ndarray]     # float32 (n, dim) embeddings, or None if not loaded
+    meta: List[Dict[str, Any]]    # the original turn dicts
+
+def turns_to_arrays(turns: List[Dict[str, Any]], load_emb: bool = True) -> TurnArrays:
+    """
+    Convert turn dicts to parallel arrays for bulk operations. spk_global values are
+    interned to int32 ids in first-seen order; embeddings are loaded via load_embs
+    unless load_emb is False.
+    """
+    n = len(turns)
+    starts = np.fromiter((t["abs_start"] for t in turns), dtype=np.float64, count=n)
+    ends = np.fromiter((t["abs_end"] for t in turns), dtype=np.float64, count=n)
+    spk_ids = np.full(n, -1, dtype=np.int32)
+    interned: Dict[Any, int] = {}
+    for i, t in enumerate(turns):
+        spk = t.get("spk_global")
+        if spk is not None:
+            spk_ids[i] = interned.setdefault(spk, len(interned))
+    emb = load_embs(turns) if load_emb else None
+    return TurnArrays(starts, ends, spk_ids, list(interned), emb, turns)
+
+def group_rows(ids: np.ndarray) -> List[np.ndarray]:
+    """
+    Row indices per non-negative id, each in ascending row order (stable).
+    """
+    valid = np.flatnonzero(ids >= 0)
+    if len(valid) == 0:
+        return []
+    order = valid[np.argsort(ids[valid], kind="stable")]
+    cuts = np.flatnonzero(np.diff(ids[order])) + 1
+    return np.split(order, cuts)
@@ -5,34 +5,54 @@ Deduplication functions for Blink multicam stitching.
 
 from typing import Any, Dict, List
 import numpy as np
+from .helpers import load_embs
+from .data import turns_to_arrays, group_rows
 
 def iou_time(a0,a1,b0,b1) -> float:
     inter = max(0.0, min(a1,b1) - max(a0,b0))
     union = (a1-a0) + (b1-b0) - inter
     return inter / max(union, 1e-6)
 
-def cosine(a: np.ndarray, b: np.ndarray) -> float:
-    a = a / max(1e-6, np.linalg.norm(a)); b = b / max(1e-6, np.linalg.norm(b))
-    return float(np.dot(a,b))
-
 def hard_dedupe(turns: List[Dict[str, Any]], iou_thresh: float, emb_cos_thresh: float) -> List[Dict[str, Any]]:
     turns = sorted(turns, key=lambda t: (t["abs_start"], t["camera"]))
     keep = [True]*len(turns)
-    X = np.vstack([np.array(t["emb"], dtype=np.float32) for t in turns])
-    for i in range(len(turns)):
-        if not keep[i] or turns[i]["spk_global"] is None: continue
-        for j in range(i+1, len(turns)):
-            if not keep[j]: continue
-            if turns[i]["spk_global"] != turns[j]["spk_global"]: continue
-            if turns[j]["abs_start"] > turns[i]["abs_end"] + 1.0: break
-            iou = iou_time(turns[i]["abs_start"], turns[i]["abs_end"], turns[j]["abs_start"], turns[j]["abs_end"])
-            if iou >= iou_thresh:
-                sim = cosine(X[i], X[j])
-                if sim >= emb_cos_thresh:
-                    di = turns[i]["abs_end"] - turns[i]["abs_start"]
-                    dj = turns[j]["abs_end"] - turns[j]["abs_start"]
-                    if di >= dj: keep[j] = False
-                    else:
-                        keep[i] = False
-                        break
-    return [t for k,t in zip(keep, turns) if k]
\ No newline at end of file
+    ta = turns_to_arrays(turns, load_emb=False)
+    starts, ends = ta.starts, ta.ends
+    # rows per global speaker (start-ordered); turns without one never dedupe against anything
+    # turns are sorted by start, so within a group only rows a+1..j_hi[a]-1 start within
+    # 1s of turn a's end; groups with no such band never need their embeddings
+    bands = []
+    for g in group_rows(ta.spk_ids):
+        if len(g) < 2: continue
+        j_hi = np.searchsorted(starts[g], ends[g] + 1.0, side="right")
+        if np.any(j_hi > np.arange(1, len(g) + 1)):
+            bands.append((g, j_hi))
+    if not bands:
+        return turns
+    # load embeddings only for turns in groups with candidate pairs
+    needed = np.concatenate([g for g, _ in bands])
+    X = load_embs([turns[i] for i in needed])
+    # embeddings are stored unit-norm by process_one_clip; only renormalize legacy caches
+    norms = np.linalg.norm(X, axis=1, keepdims=True)
+    if not np.allclose(norms, 1.0, atol=1e-3): X /= np.maximum(norms, 1e-6)
+    row = np.empty(len(turns), dtype=np.intp)
+    row[needed] = np.arange(len(needed))
+    for g, j_hi in bands:
+        Xg = X[row[g]]
+        s, e = starts[g], ends[g]
+        dur = e - s
+        # resolve pairs in the same greedy order as a pairwise scan:
+        # the longer turn survives, ties favour the earlier one
+        for a in range(len(g)):
+            if not keep[g[a]] or j_hi[a] <= a + 1: continue
+            band = np.arange(a + 1, j_hi[a])
+            sim = Xg[band] @ Xg[a]
+            inter = np.maximum(0.0, np.minimum(e[a], e[band]) - np.maximum(s[a], s[band]))
+            iou = inter / np.maximum(dur[a] + dur[band] - inter, 1e-6)
+            for b in band[(iou >= iou_thresh) & (sim >= emb_cos_thresh)]:
+                if not keep[g[b]]: continue
+                if dur[a] >= dur[b]: keep[g[b]] = False
+                else:
+                    keep[g[a]] = False
+                    break
+    return [t for k,t in zip(keep, turns) if k]
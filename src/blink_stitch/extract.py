@@ -3,14 +3,17 @@
 Extract functions for Blink multicam stitching.
 """
 
-from typing import Any, Dict, List, Optional, Tuple
-import os, re, json
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Union
+import os, re
+import contextlib
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from loguru import logger
 import numpy as np
-from .helpers import get_clip_start_epoch, get_camera_id, extract_audio_16k_mono, ensure_dir, md5, HAVE_INASPEECH, device_hint
-from pyannote.audio import Pipeline as PyannotePipeline, Inference as PNA_Inference
+from .helpers import get_clip_start_epoch, get_camera_id, extract_audio_16k_mono, ensure_dir, clip_stem, read_json, write_json, load_wav_cached, HAVE_INASPEECH, device_hint
+from pyannote.audio import Pipeline as PyannotePipeline, Inference as PNA_Inference, Model as PNA_Model
 from pyannote.core import Segment as PNA_Segment
-import torch, gc
+import torch
 from faster_whisper import WhisperModel as FWModel
 
 try:
@@ -20,20 +23,42 @@ except Exception:
     Segmenter = None
     pass
 
+_THREADS_LIMITED = False
+_WS_RE = re.compile(r"\s+")
+
+def _init_threads():
+    """
+    Limit torch to a single intra-/inter-op thread. Thread counts are process-global,
+    so this only needs to happen once per process.
+    """
+    global _THREADS_LIMITED
+    if _THREADS_LIMITED:
+        return
+    try:
+        if hasattr(torch, "set_num_threads"):
+            torch.set_num_threads(1)
+        if hasattr(torch, "set_num_interop_threads"):
+            torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # interop threads can only be set before any parallel work has started
+        pass
+    _THREADS_LIMITED = True
+
+# Faster-Whisper models keyed by (model_size, device), kept resident across clips
+_FW: Dict[Tuple[str, str], FWModel] = {}
+
+def _get_fw(model_size: str) -> FWModel:
+    key = (model_size, device_hint())
+    if key not in _FW:
+        logger.info("Creating WhisperModel")
+        _FW[key] = FWModel(model_size, device=key[1], compute_type="auto")
+    return _FW[key]
+
 def asr_transcribe_words(wav_path: str, model_size: str, use_vad=True):
-    logger.info("Creating WhisperModel")
-    model = FWModel(model_size, device=device_hint(), compute_type="auto")
-    # Limit thread usage for inference
-    if hasattr(torch, "set_num_threads"):
-        torch.set_num_threads(1)
-    if hasattr(torch, "set_num_interop_threads"):
-        torch.set_num_interop_threads(1)
+    model = _get_fw(model_size)
+    _init_threads()
     logger.info("Transcribing audio with WhisperModel")
     segments, info = model.transcribe(wav_path, vad_filter=use_vad, word_timestamps=True)
-    # Explicit resource cleanup after inference
-    del model
-    import gc
-    gc.collect()
     logger.info("Processing transcription segments")
     words = []
     for s in segments:
@@ -48,31 +73,116 @@ def whisperx_align_words(audio_wav: str, lang_code: str, rough_segments: List[Di
     # Here, we simply return rough_segments as-is; extension left for SERIOUS alignment usage.
     return rough_segments
 
+# one inaSpeechSegmenter per process; constructing it loads its Keras models
+_SEGMENTER = None
+
+def _get_segmenter():
+    global _SEGMENTER
+    if _SEGMENTER is None:
+        logger.info("Creating inaSpeechSegmenter")
+        _SEGMENTER = Segmenter()
+    return _SEGMENTER
+
 def run_inaspeech_mask(wav_path: str) -> List[Tuple[float,float,str]]:
     if not HAVE_INASPEECH:
         return []
-    res = Segmenter()(wav_path) if Segmenter else []
+    res = _get_segmenter()(wav_path) if Segmenter else []
     return [(float(s), float(e), str(l)) for (l, s, e) in res]
 
-def words_to_text_in_interval(words: List[Dict[str, Any]], a: float, b: float,
+class WordIndex(NamedTuple):
+    """Per-clip word arrays for interval lookups; `ok` is the precomputed speech-mask test."""
+    starts: np.ndarray
+    ends: np.ndarray
+    toks: np.ndarray
+    ok: np.ndarray
+
+def _overlaps_any(t0: np.ndarray, t1: np.ndarray, intervals: List[Tuple[float,float]]) -> np.ndarray:
+    """Boolean per [t0,t1] span: does it overlap (positive length) any of `intervals`?"""
+    iv = np.asarray(intervals, dtype=np.float64).reshape(-1, 2)
+    iv = iv[iv[:, 1] > iv[:, 0]]
+    if len(iv) == 0:
+        return np.zeros(len(t0), dtype=bool)
+    order = np.argsort(iv[:, 0], kind="stable")
+    iv_start = iv[order, 0]
+    # running max of interval ends among intervals starting before t1
+    iv_end_max = np.maximum.accumulate(iv[order, 1])
+    k = np.searchsorted(iv_start, t1, side="left")
+    hit = k > 0
+    hit[hit] = iv_end_max[k[hit] - 1] > t0[hit]
+    return hit & (t1 > t0)
+
+def index_words(words: List[Dict[str, Any]],
+                speech_mask: Optional[List[Tuple[float,float,str]]] = None) -> WordIndex:
+    """
+    Build a WordIndex once per clip. A word passes the speech mask if it overlaps any
+    "speech" segment and no "music"/"noise" segment; with no mask every word passes.
+    """
+    starts = np.fromiter((w["start"] for w in words), dtype=np.float64, count=len(words))
+    ends = np.fromiter((w["end"] for w in words), dtype=np.float64, count=len(words))
+    toks = np.array([w["word"] for w in words], dtype=object)
+    if not speech_mask:
+        ok = np.ones(len(words), dtype=bool)
+    else:
+        speech = [(s0, s1) for s0, s1, label in speech_mask if label == "speech"]
+        noisy = [(s0, s1) for s0, s1, label in speech_mask if label in ("music", "noise")]
+        ok = _overlaps_any(starts, ends, speech) & ~_overlaps_any(starts, ends, noisy)
+    return WordIndex(starts, ends, toks, ok)
+
+def words_to_text_in_interval(words: Union[List[Dict[str, Any]], WordIndex], a: float, b: float,
                               speech_mask: Optional[List[Tuple[float,float,str]]] = None) -> str:
-    def in_speech(t0, t1):
-        if not speech_mask:
-            return True
-        ok = False
-        for s0,s1,label in speech_mask:
-            if label == "speech" and (min(t1, s1) - max(t0, s0)) > 0:
-                ok = True
-
-        if not ok:
-            return False
-        for s0,s1,label in speech_mask:
-            if label in ("music","noise") and (min(t1, s1) - max(t0, s0)) > 0:
-                return False
-        return True
-    toks = [w["word"] for w in words if (w["start"] <= b and w["end"] >= a) and in_speech(w["start"], w["end"])]
-    out = " ".join(toks)
-    return re.sub(r"\s+", " ", out).strip()
+    """
+    Join the words overlapping [a,b] that pass the speech mask. Pass a WordIndex from
+    index_words to reuse it across many intervals (speech_mask is then ignored).
+    """
+    widx = words if isinstance(words, WordIndex) else index_words(words, speech_mask)
+    mask = (widx.starts <= b) & (widx.ends >= a) & widx.ok
+    out = " ".join(widx.toks[mask])
+    return _WS_RE.sub(" ", out).strip()
+
+# Resolution of the per-turn pooling masks; the pooling layer interpolates them to the model's frame rate
+_MASK_HZ = 100
+
+def _pooled_turn_embeddings(model, waveform: torch.Tensor, sr: int,
+                            turns: List[Tuple[float,float,str]]) -> np.ndarray:
+    """
+    Embed every turn from one backbone pass over the whole clip: forward_frames runs once,
+    then forward_embedding pools the frames under one binary mask per turn.
+    """
+    n = max(1, int(np.ceil(waveform.shape[-1] / sr * _MASK_HZ)))
+    weights = torch.zeros(1, len(turns), n)
+    for k, (s, e, _) in enumerate(turns):
+        a = min(int(s * _MASK_HZ), n - 1)
+        weights[0, k, a:max(a + 1, int(np.ceil(e * _MASK_HZ)))] = 1.0
+    device = getattr(model, "device", torch.device("cpu"))
+    with torch.inference_mode():
+        frames = model.forward_frames(waveform[None].to(device))
+        embs = model.forward_embedding(frames, weights=weights.to(device))
+    return embs.reshape(len(turns), -1).float().cpu().numpy()
+
+def load_cached_turns(path: str, cache_dir: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    Return the cached turns for a clip if process_one_clip already produced them, else None.
+    """
+    stem = clip_stem(path)
+    json_turns = os.path.join(cache_dir, f"{stem}.turns.json")
+    emb_npy = os.path.join(cache_dir, f"{stem}.emb.npy")
+    if not (os.path.exists(json_turns) and os.path.exists(emb_npy)):
+        return None
+    logger.info(f"Loading cached turns from {json_turns}")
+    return _resolve_emb_refs(read_json(json_turns), cache_dir)
+
+def _resolve_emb_refs(turns: List[Dict[str, Any]], cache_dir: str) -> List[Dict[str, Any]]:
+    """
+    Point each turn's emb_ref at its sidecar inside cache_dir. The turns JSON stores only the
+    sidecar file name so a moved or remounted cache stays loadable; absolute refs from older
+    caches pass through os.path.join unchanged.
+    """
+    base = os.path.abspath(cache_dir)
+    for t in turns:
+        ref = t.get("emb_ref")
+        if ref is not None:
+            t["emb_ref"] = [os.path.join(base, ref[0]), ref[1]]
+    return turns
 
 def process_one_clip(path: str,
                      cfg: Dict[str, Any],
@@ -80,20 +190,22 @@ def process_one_clip(path: str,
                      emb_infer: PNA_Inference,
                      cache_dir: str) -> List[Dict[str, Any]]:
     """
-    Returns list of serialized 'turn' dicts. Caches WAV and words JSON per clip.
+    Returns list of serialized 'turn' dicts. Caches WAV and words JSON per clip,
+    plus a float16 .emb.npy matrix holding the turn embeddings.
     """
+    _init_threads()
     logger.info(f"Ensuring cache_dir exists: {cache_dir}")
     ensure_dir(cache_dir)
-    base = os.path.splitext(os.path.basename(path))[0]
-    stem = md5(path) + "_" + base
+    stem = clip_stem(path)
     wav = os.path.join(cache_dir, f"{stem}.16k.wav")
     json_words = os.path.join(cache_dir, f"{stem}.words.json")
     json_turns = os.path.join(cache_dir, f"{stem}.turns.json")
+    emb_name = f"{stem}.emb.npy"
+    emb_npy = os.path.join(cache_dir, emb_name)
 
-    if os.path.exists(json_turns):
-        logger.info(f"Loading cached turns from {json_turns}")
-        with open(json_turns, "r", encoding="utf-8") as f:
-            return json.load(f)
+    cached = load_cached_turns(path, cache_dir)
+    if cached is not None:
+        return cached
 
     clip_start = get_clip_start_epoch(path, cfg["time_source"], cfg["filename_regex"], cfg["ts_format"])
     camera = get_camera_id(path, cfg["camera_from"], cfg["filename_regex"])
@@ -105,14 +217,14 @@ def process_one_clip(path: str,
     speech_mask = run_inaspeech_mask(wav) if cfg["filter_music_tv"] else None
 
     if os.path.exists(json_words):
-        with open(json_words, "r", encoding="utf-8") as f:
-            words = json.load(f)
+        words = read_json(json_words)
     else:
-        words = asr_transcribe_words(wav, cfg["asr_model"], use_vad=True)
-        with open(json_words, "w", encoding="utf-8") as f:
-            json.dump(words, f)
+        with _gpu_slot():
+            words = asr_transcribe_words(wav, cfg["asr_model"], use_vad=True)
+        write_json(json_words, words)
 
-    diar = diar_pipeline(wav).support(trimming="loose")
+    with _gpu_slot():
+        diar = diar_pipeline(wav).support(trimming="loose")
 
     min_turn = float(cfg["min_turn_dur"])
     diar_turns: List[Tuple[float,float,str]] = []
@@ -122,32 +234,106 @@ def process_one_clip(path: str,
             diar_turns.append((s, e, str(label)))
 
     embs = []
-    for (s,e,_) in diar_turns:
-        # Limit thread usage for embedding inference
-        if hasattr(torch, "set_num_threads"):
-            torch.set_num_threads(1)
-        if hasattr(torch, "set_num_interop_threads"):
-            torch.set_num_interop_threads(1)
-        vec = emb_infer({"audio": wav, "segment": PNA_Segment(s,e)})
-        # Explicit resource cleanup after inference
-        gc.collect()
-        embs.append(np.asarray(vec, dtype=np.float32).ravel())
+    if diar_turns:
+        # decode the clip WAV once and embed turns from memory instead of re-reading per turn
+        samples, sr = load_wav_cached(wav)
+        waveform = torch.from_numpy(np.array(samples, dtype=np.float32, ndmin=2))
+        model = getattr(emb_infer, "model", None)
+        with _gpu_slot():
+            if hasattr(model, "forward_frames") and hasattr(model, "forward_embedding"):
+                vecs = _pooled_turn_embeddings(model, waveform, sr, diar_turns)
+            else:
+                audio = {"waveform": waveform, "sample_rate": sr}
+                with torch.inference_mode():
+                    vecs = [emb_infer.crop(audio, PNA_Segment(s,e)) for (s,e,_) in diar_turns]
+        for vec in vecs:
+            vec = np.asarray(vec, dtype=np.float32).ravel()
+            embs.append(vec / (np.linalg.norm(vec) + 1e-6))
 
+    # embeddings live in a float16 sidecar; turns carry a [file name, row] reference, resolved against
+    # cache_dir on load (see helpers.load_embs)
+    np.save(emb_npy, np.stack(embs).astype(np.float16) if embs else np.empty((0, 0), dtype=np.float16))
+
+    widx = index_words(words, speech_mask)
     out: List[Dict[str, Any]] = []
     for (i,(s,e,lab)) in enumerate(diar_turns):
-        txt = words_to_text_in_interval(words, s, e, speech_mask=speech_mask)
+        txt = words_to_text_in_interval(widx, s, e)
         out.append({
             "start": s, "end": e,
             "abs_start": clip_start + s, "abs_end": clip_start + e,
             "clip": os.path.basename(path),
             "clip_path": os.path.abspath(path),
+            "wav_path": os.path.abspath(wav),
             "camera": camera,
             "spk_local": lab,
             "text": txt,
-            "emb": embs[i].tolist(),
+            "emb_ref": [emb_name, i],
             "spk_global": None
         })
 
-    with open(json_turns, "w", encoding="utf-8") as f:
-        json.dump(out, f)
-    return out
+    write_json(json_turns, out)
+    return _resolve_emb_refs(out, cache_dir)
+
+# Per-worker model handles, populated by _init_models in each pool process
+_WORKER_MODELS: Dict[str, Any] = {}
+
+# Cross-process semaphore serializing the GPU-bound steps when pool workers share one CUDA device
+_GPU_LOCK = None
+
+def _gpu_slot():
+    return _GPU_LOCK if _GPU_LOCK is not None else contextlib.nullcontext()
+
+def _init_models(cfg: Dict[str, Any], gpu_lock=None):
+    """
+    Load the diarization pipeline and embedding inference once per worker process.
+    """
+    global _GPU_LOCK
+    _GPU_LOCK = gpu_lock
+    token = os.getenv("HF_TOKEN")
+    diar = PyannotePipeline.from_pretrained(cfg["model_path"], use_auth_token=token)
+    emb_model = PNA_Model.from_pretrained(cfg.get("embedding_model", "pyannote/embedding"), use_auth_token=token)
+    _WORKER_MODELS["diar_pipeline"] = diar
+    _WORKER_MODELS["emb_infer"] = PNA_Inference(emb_model, window="whole")
+
+def _process_clip_worker(path: str, cfg: Dict[str, Any], cache_dir: str) -> List[Dict[str, Any]]:
+    return process_one_clip(path, cfg, _WORKER_MODELS["diar_pipeline"], _WORKER_MODELS["emb_infer"], cache_dir)
+
+def process_clips(paths: List[str], cfg: Dict[str, Any], cache_dir: str, workers: int = 1) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Run process_one_clip over many clips, returning {path: turns}.
+
+    Clips with cached turns are answered without loading any model. The rest run in a
+    ProcessPoolExecutor of up to `workers` processes (capped at the CPU count and the
+    number of clips), each loading its own models once via _init_models; workers <= 1
+    processes them serially in this process. On CUDA the GPU-bound steps of each clip
+    are serialized across workers by a semaphore.
+    """
+    ensure_dir(cache_dir)
+    results: Dict[str, List[Dict[str, Any]]] = {}
+    todo = []
+    for p in paths:
+        cached = load_cached_turns(p, cache_dir)
+        if cached is not None:
+            results[p] = cached
+        else:
+            todo.append(p)
+    if not todo:
+        return {p: results[p] for p in paths}
+
+    if workers <= 1:
+        if not _WORKER_MODELS:
+            _init_models(cfg)
+        for p in todo:
+            results[p] = _process_clip_worker(p, cfg, cache_dir)
+        return {p: results[p] for p in paths}
+
+    # device_hint() may initialize CUDA here, and a forked child can't use it; spawn fresh workers
+    ctx = mp.get_context("spawn")
+    # ASR/diarization/embedding take turns on a shared GPU; ffmpeg and other CPU work still overlap
+    gpu_lock = ctx.Semaphore(1) if device_hint() == "cuda" else None
+    workers = min(workers, os.cpu_count() or 1, len(todo))
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_models, initargs=(cfg, gpu_lock)) as ex:
+        futures = {ex.submit(_process_clip_worker, p, cfg, cache_dir): p for p in todo}
+        for fut in as_completed(futures):
+            results[futures[fut]] = fut.result()
+    return {p: results[p] for p in paths}
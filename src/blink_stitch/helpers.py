@@ -21,10 +21,33 @@ set_openmp_env()
 
 import re, json, hashlib, subprocess
 import logging
+import functools
 from pathlib import Path
-from typing import List, Optional, Iterable
+from typing import List, Optional, Iterable, Tuple, Union, Pattern
 
-import torch
+import numpy as np
+import soundfile as sf
+
+try:
+    import orjson
+    HAVE_ORJSON = True
+except ImportError:
+    orjson = None
+    HAVE_ORJSON = False
+
+try:
+    import xxhash
+    HAVE_XXHASH = True
+except ImportError:
+    xxhash = None
+    HAVE_XXHASH = False
+
+try:
+    import av
+    HAVE_AV = True
+except ImportError:
+    av = None
+    HAVE_AV = False
 
 # Optional deps (lazy)
 HAVE_HDBSCAN = False
@@ -38,6 +61,8 @@ def sh(cmd: List[str], check=True) -> subprocess.CompletedProcess:
     return subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=check)
 
 def device_hint() -> str:
+    # torch is imported lazily so light helpers (hashing, JSON, discovery) don't pay for it
+    import torch
     if torch.cuda.is_available():
         return "cuda"
     if torch.backends.mps.is_available():
@@ -45,15 +70,109 @@ def device_hint() -> str:
     return "cpu"
 
 def md5(s: str) -> str:
-    return hashlib.md5(s.encode("utf-8")).hexdigest()[:12]
+    """
+    Short hex digest of a string, used only as a cache-file key (not security-sensitive).
+    Uses xxh3 when xxhash is installed, else blake2b, which unlike md5 is FIPS-safe
+    (note: either yields different keys than hashlib.md5, so caches are rebuilt).
+    """
+    if HAVE_XXHASH:
+        return xxhash.xxh3_64_hexdigest(s.encode("utf-8"))[:12]
+    return hashlib.blake2b(s.encode("utf-8"), digest_size=6).hexdigest()
+
+def clip_stem(path: str) -> str:
+    """Cache-file stem for a clip: short path hash plus the clip's base name."""
+    base = os.path.splitext(os.path.basename(path))[0]
+    return md5(path) + "_" + base
 
 def ensure_dir(p: str):
     os.makedirs(p, exist_ok=True)
 
-def ffprobe_meta(path: str) -> dict:
+def _json_default(o):
+    if isinstance(o, (np.ndarray, np.generic)):
+        return o.tolist()
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+def write_json(path: str, obj, indent: bool = False):
+    """
+    Serialize obj to path, via orjson when installed (numpy arrays are written natively),
+    else the stdlib json module. indent=True pretty-prints with two spaces.
+    """
+    if HAVE_ORJSON:
+        opts = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if indent:
+            opts |= orjson.OPT_INDENT_2
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(obj, option=opts))
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False, indent=2 if indent else None, default=_json_default)
+
+def write_json_records(path: str, key: str, records: Iterable):
+    """
+    Write {key: [records...]} with one record per line, encoding each record as the iterable
+    yields it so the full list is never held in memory. Same encoder choice as write_json.
+    """
+    if HAVE_ORJSON:
+        dumps = lambda o: orjson.dumps(o, option=orjson.OPT_SERIALIZE_NUMPY)
+    else:
+        dumps = lambda o: json.dumps(o, ensure_ascii=False, default=_json_default).encode("utf-8")
+    with open(path, "wb") as f:
+        f.write(b"{" + dumps(key) + b": [")
+        sep = b"\n  "
+        for rec in records:
+            f.write(sep + dumps(rec))
+            sep = b",\n  "
+        f.write(b"\n]}\n")
+
+def read_json(path: str):
+    """
+    Parse a JSON file, via orjson when installed (reads bytes, no text decode step),
+    else the stdlib json module.
+    """
+    if HAVE_ORJSON:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def load_embs(turns: List[dict]) -> np.ndarray:
+    """
+    Stack turn embeddings into a float32 matrix, one row per turn.
+
+    Turns returned by process_one_clip carry "emb_ref": [npy_path, row] pointing into a
+    per-clip float16 sidecar (the turns JSON stores only the file name; extract resolves it
+    against the cache dir on load). Each sidecar is memory-mapped once and only the
+    referenced rows are read. Legacy turns with an inline "emb" list are still accepted.
+    """
+    mats: dict = {}
+    rows = []
+    for t in turns:
+        ref = t.get("emb_ref")
+        if ref is None:
+            rows.append(np.asarray(t["emb"], dtype=np.float32))
+            continue
+        npy_path, row = ref
+        if npy_path not in mats:
+            mats[npy_path] = np.load(npy_path, mmap_mode="r")
+        rows.append(mats[npy_path][row])
+    if not rows:
+        return np.empty((0, 0), dtype=np.float32)
+    return np.vstack(rows).astype(np.float32, copy=False)
+
+@functools.lru_cache(maxsize=4096)
+def _ffprobe_cached(path: str, mtime_ns: int, size: int) -> dict:
     p = sh(["ffprobe", "-v", "quiet", "-print_format", "json", "-show_format", "-show_streams", path])
     return json.loads(p.stdout)
 
+def ffprobe_meta(path: str) -> dict:
+    """
+    ffprobe JSON for a media file, memoized per (path, mtime, size) within a process so a clip
+    probed by preflight and again for its start time spawns ffprobe once. The returned dict is
+    shared between callers and must not be modified.
+    """
+    st = os.stat(path)
+    return _ffprobe_cached(path, st.st_mtime_ns, st.st_size)
+
 def parse_filename_ts(path: str, pattern: Optional[str], ts_format: Optional[str]) -> Optional[float]:
     if not pattern or not ts_format:
         return None
@@ -89,12 +208,13 @@ def get_clip_start_epoch(path: str, time_source: str, filename_regex: Optional[s
         time_source = "mtime"
     return os.path.getmtime(path)
 
-def get_camera_id(path: str, camera_from: str, filename_regex: Optional[str]) -> str:
+def get_camera_id(path: str, camera_from: str, filename_regex: Union[str, Pattern, None]) -> str:
+    """filename_regex may be pre-compiled by callers that resolve many paths."""
     if camera_from == "parentdir":
         return os.path.basename(os.path.dirname(path)) or "camera"
     bn = os.path.basename(path)
     if camera_from == "regex" and filename_regex:
-        m = re.search(filename_regex, bn)
+        m = (re.compile(filename_regex) if isinstance(filename_regex, str) else filename_regex).search(bn)
         if m and "camera" in m.groupdict():
             return m.group("camera")
     if camera_from == "filename":
@@ -104,15 +224,88 @@ def get_camera_id(path: str, camera_from: str, filename_regex: Optional[str]) ->
 def extract_audio_16k_mono(in_mp4: str, out_wav: str):
     sh(["ffmpeg", "-y", "-i", in_mp4, "-ac", "1", "-ar", "16000", "-vn", out_wav])
 
+@functools.lru_cache(maxsize=16)
+def load_wav_cached(path: str) -> Tuple[np.ndarray, int]:
+    """
+    Read a WAV file as float32 samples, memoized per path within a run. The returned
+    array is shared between callers and must not be modified in place.
+    """
+    samples, sr = sf.read(path, dtype="float32", always_2d=False)
+    samples.setflags(write=False)
+    return samples, sr
+
 def clip_to_segment_wav(src_mp4: str, start: float, end: float, out_wav: str):
     dur = max(0.05, end - start)
     sh(["ffmpeg", "-y", "-ss", f"{start:.3f}", "-t", f"{dur:.3f}", "-i", src_mp4, "-ac", "1", "-ar", "16000", "-vn", out_wav])
 
+def clip_to_segment_pcm(src_mp4: str, start: float, end: float) -> np.ndarray:
+    """
+    Same cut as clip_to_segment_wav, but ffmpeg writes raw s16le PCM to stdout and the
+    samples come back as 16 kHz mono float32 in [-1, 1); nothing is written to disk.
+    """
+    dur = max(0.05, end - start)
+    p = subprocess.run(["ffmpeg", "-v", "error", "-ss", f"{start:.3f}", "-t", f"{dur:.3f}", "-i", src_mp4,
+                        "-ac", "1", "-ar", "16000", "-vn", "-f", "s16le", "-acodec", "pcm_s16le", "-"],
+                       stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    return np.frombuffer(p.stdout, dtype=np.int16).astype(np.float32) / 32768.0
+
+@functools.lru_cache(maxsize=256)
+def _decode_segment_cached(src: str, start: float, end: float) -> np.ndarray:
+    with av.open(src) as container:
+        stream = container.streams.audio[0]
+        if start > 0:
+            # lands on the last seekable point at or before start; trimmed below
+            container.seek(int(start / stream.time_base), stream=stream)
+        resampler = av.AudioResampler(format="flt", layout="mono", rate=16000)
+        chunks, t_first = [], None
+        for frame in container.decode(stream):
+            if frame.pts is None:
+                continue
+            t = float(frame.pts * stream.time_base)
+            if t >= end:
+                break
+            if t_first is None:
+                t_first = t
+            chunks.extend(f.to_ndarray().reshape(-1) for f in resampler.resample(frame))
+        chunks.extend(f.to_ndarray().reshape(-1) for f in resampler.resample(None))
+    if not chunks:
+        return np.zeros(0, dtype=np.float32)
+    audio = np.concatenate(chunks).astype(np.float32, copy=False)
+    off = max(0, int(round((start - t_first) * 16000)))
+    out = audio[off:off + int(round(max(0.05, end - start) * 16000))]
+    out.setflags(write=False)
+    return out
+
+def decode_segment_16k_mono(src: str, start: float, end: float) -> np.ndarray:
+    """
+    Decode [start, end) of a media file's first audio stream in-process with PyAV, as 16 kHz
+    mono float32 (what clip_to_segment_wav writes, without the ffmpeg process or the WAV).
+    Results are LRU-cached per (src, start, end) at ms resolution and are read-only.
+    """
+    if not HAVE_AV:
+        raise RuntimeError("PyAV (av) not installed.")
+    return _decode_segment_cached(src, round(float(start), 3), round(float(end), 3))
+
+def clip_to_segment_wavs(src_mp4: str, segments: List[Tuple[float, float, str]]):
+    """
+    Cut several (start, end, out_wav) segments from one source in a single ffmpeg run.
+    The input is opened and decoded once; each output seeks with its own -ss/-t.
+    """
+    if not segments:
+        return
+    cmd = ["ffmpeg", "-y", "-i", src_mp4]
+    for start, end, out_wav in segments:
+        dur = max(0.05, end - start)
+        cmd += ["-ss", f"{start:.3f}", "-t", f"{dur:.3f}", "-ac", "1", "-ar", "16000", "-vn", out_wav]
+    sh(cmd)
+
 # Media discovery helpers
 # Small, deterministic helpers to locate media files (video/audio) in mixed layouts.
 # Kept minimal and conservative; returns absolute (resolved) paths to match common usage.
 VIDEO_EXTS = {".mp4", ".mov", ".avi", ".mkv", ".mpg", ".mpeg", ".ts"}
 AUDIO_EXTS = {".wav", ".mp3", ".aac", ".m4a", ".flac", ".ogg"}
+# standalone audio captures that shallow (non-recursive) discovery prefers over video
+PREFERRED_AUDIO_EXTS = frozenset({".wav", ".flac"})
 
 def normalize_ext(path_or_name: str) -> str:
     """
@@ -121,6 +314,54 @@ def normalize_ext(path_or_name: str) -> str:
     """
     return Path(path_or_name).suffix.lower()
 
+def _name_ext(name: str) -> str:
+    """normalize_ext on a bare name/path string, without building a Path."""
+    base = name[name.rfind(os.sep) + 1:]
+    i = base.rfind(".")
+    return base[i:].lower() if 0 < i < len(base) - 1 else ""
+
+def _visible(entry: os.DirEntry) -> bool:
+    return not entry.name.startswith(".") and not entry.is_symlink()
+
+def _scan_media(d: str, chosen) -> Iterable[str]:
+    """Non-hidden, non-symlink files directly in d whose extension is in chosen."""
+    try:
+        with os.scandir(d) as it:
+            for e in it:
+                if _visible(e) and e.is_file(follow_symlinks=False) and _name_ext(e.name) in chosen:
+                    yield e.path
+    except OSError:
+        return
+
+def _scan_dirs(d: str) -> Iterable[str]:
+    """Non-hidden, non-symlink subdirectories directly in d."""
+    try:
+        with os.scandir(d) as it:
+            for e in it:
+                if _visible(e) and e.is_dir(follow_symlinks=False):
+                    yield e.path
+    except OSError:
+        return
+
+def _walk_media(d: str, chosen) -> Iterable[str]:
+    """
+    Recursive os.scandir walk yielding media files, skipping hidden entries and symlinks
+    (hidden directories are not descended into). scandir reuses the dirent type, so
+    no per-entry stat or Path object is needed.
+    """
+    try:
+        with os.scandir(d) as it:
+            entries = list(it)
+    except OSError:
+        return
+    for e in entries:
+        if not _visible(e):
+            continue
+        if e.is_dir(follow_symlinks=False):
+            yield from _walk_media(e.path, chosen)
+        elif e.is_file(follow_symlinks=False) and _name_ext(e.name) in chosen:
+            yield e.path
+
 def discover_media_paths(paths: List[str], recursive: bool = True, exts: Optional[Iterable[str]] = None) -> List[str]:
     """
     Discover media file paths from a list of files or directories.
@@ -128,7 +369,8 @@ def discover_media_paths(paths: List[str], recursive: bool = True, exts: Optiona
     - paths: iterable of file or directory paths (strings).
     - recursive: if True, directories are traversed recursively (Path.rglob); otherwise only top-level (Path.glob).
     - exts: optional iterable of extensions (with or without a leading dot); case-insensitive.
-            If not provided, defaults to VIDEO_EXTS | AUDIO_EXTS.
+            If not provided, defaults to VIDEO_EXTS | AUDIO_EXTS. A frozenset is taken as
+            already normalized (lower-case, leading dot) and used as-is.
 
     Returns:
         A deterministic, sorted list of absolute paths (as strings). Non-existing paths are skipped
@@ -141,6 +383,9 @@ def discover_media_paths(paths: List[str], recursive: bool = True, exts: Optiona
     # callers may pass either form. This mirrors behavior expected by tests.
     if exts is None:
         chosen = set(VIDEO_EXTS) | set(AUDIO_EXTS)
+    elif isinstance(exts, frozenset):
+        # pre-normalized (see cli._parse_extensions)
+        chosen = exts
     else:
         chosen = set()
         for e in exts:
@@ -160,50 +405,26 @@ def discover_media_paths(paths: List[str], recursive: bool = True, exts: Optiona
                 results.add(str(pth.resolve()))
             continue
         if pth.is_dir():
+            # below the (resolved) input dir nothing is a symlink, so entry paths are already resolved
+            root = os.path.realpath(p)
             if recursive:
                 # Recursive traversal: walk all descendants but skip hidden files/dirs and symbolic links
-                iterator = pth.rglob("*")
-                for child in iterator:
-                    try:
-                        # skip symlinks to avoid loops and hidden files/dirs (any path component starting with '.')
-                        if child.is_symlink():
-                            continue
-                        if any(part.startswith(".") for part in child.parts):
-                            continue
-                    except Exception:
-                        # best-effort: if parts inspection fails, skip the entry
-                        continue
-                    if child.is_file() and normalize_ext(child.name) in chosen:
-                        results.add(str(child.resolve()))
+                for f in _walk_media(root, chosen):
+                    results.add(f)
             else:
                 # Non-recursive discovery semantics (conservative) — per-input behaviour:
                 # - collect top-level media files for this input directory (skip hidden and symlinks)
                 # - if any top-level media found, prefer top-level files only
                 #   and, if any top-level audio (.wav/.flac) present, prefer audio-only
                 # - if no top-level media found, fall back to scanning immediate subdirectories
-                top_files = []
-                for child in pth.glob("*"):
-                    if child.name.startswith(".") or child.is_symlink():
-                        continue
-                    if child.is_file() and normalize_ext(child.name) in chosen:
-                        top_files.append(child)
+                top_files = list(_scan_media(root, chosen))
                 if top_files:
                     # If any top-level audio exists prefer audio-only results for shallow scans
-                    audio_exts = {".wav", ".flac"}
-                    top_audio = [f for f in top_files if normalize_ext(f.name) in audio_exts]
-                    selected = top_audio if top_audio else top_files
-                    for f in selected:
-                        results.add(str(f.resolve()))
+                    top_audio = [f for f in top_files if _name_ext(f) in PREFERRED_AUDIO_EXTS]
+                    results.update(top_audio if top_audio else top_files)
                 else:
                     # Fallback: look in immediate subdirectories (one-level deep), applying same hidden/symlink rules
-                    for child in pth.iterdir():
-                        if child.is_symlink() or child.name.startswith("."):
-                            continue
-                        if child.is_dir():
-                            for sub in child.glob("*"):
-                                if sub.name.startswith(".") or sub.is_symlink():
-                                    continue
-                                if sub.is_file() and normalize_ext(sub.name) in chosen:
-                                    results.add(str(sub.resolve()))
+                    for sub in _scan_dirs(root):
+                        results.update(_scan_media(sub, chosen))
 
     return sorted(results)
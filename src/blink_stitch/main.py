@@ -4,24 +4,32 @@ This script orchestrates the pipeline for processing multiple camera inputs,
 stitching them together, and generating the final output.
 """
 
+from __future__ import annotations
+
 from .helpers import set_openmp_env
 set_openmp_env()
 
 import os
 import sys
 import json
-from typing import Dict, List
+import time
+import functools
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import TYPE_CHECKING, Dict, List, Optional
 from pathlib import Path
 import argparse
 from loguru import logger
 from ..progress.state import PipelineState
 from ..progress.ui import Dashboard
-from ..progress.errors import ErrorManager
-from pyannote.audio import Pipeline
-from pyannote.core import Annotation
-import yaml
+from ..progress.errors import ErrorManager, ErrorType
+from ..progress.logging_setup import configure as configure_progress_logging
+
+# pyannote and yaml are imported where used so CLI startup does not pay for torch/pyannote
+if TYPE_CHECKING:
+    from pyannote.core import Annotation
 
-from .helpers import discover_media_paths  # local import to avoid cycles
+from .helpers import discover_media_paths, PREFERRED_AUDIO_EXTS, read_json, write_json, write_json_records  # local import to avoid cycles
 
 # Configure logging will be applied from config at runtime (see configure_logging())
 
@@ -57,6 +65,38 @@ def configure_logging(logging_cfg: dict) -> None:
 
     logger.add(log_file, **add_kwargs)
 
+def _config_cache_path(config_path: str) -> Path:
+    """JSON copy of a parsed config, kept in .cache/ next to the YAML."""
+    p = Path(config_path)
+    return p.parent / ".cache" / (p.name + ".json")
+
+def _write_config_cache(cache_path: Path, source_hash: str, cfg: Dict) -> None:
+    """Best effort; skipped when the config does not survive a JSON round trip (dates, int keys)
+    or the cache directory can't be written."""
+    try:
+        if json.loads(json.dumps(cfg)) != cfg:
+            return
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        write_json(str(cache_path), {"source_hash": source_hash, "config": cfg})
+    except (OSError, TypeError, ValueError):
+        pass
+
+def _segment_records(annotation: Annotation):
+    """Output dicts for an annotation's tracks; start/end stand in for the pyannote Segment,
+    which the stdlib encoder cannot serialize."""
+    for segment, track, label in annotation.itertracks(yield_label=True):  # pyright: ignore[reportAssignmentType]
+        yield {
+            "start": segment.start,
+            "end": segment.end,
+            "track": track,
+            "label": label
+        }
+
+@functools.lru_cache(maxsize=16)
+def _cached_discover(paths: frozenset, recursive: bool, exts: Optional[frozenset]) -> tuple:
+    """discover_media_paths memoized on normalized arguments; cleared when the config is (re)loaded."""
+    return tuple(discover_media_paths(sorted(paths), recursive=recursive, exts=exts))
+
 # Constants
 DEFAULT_CONFIG_PATH = "config.json"
 DEFAULT_OUTPUT_DIR = "output"
@@ -81,6 +121,7 @@ class BlinkMulticameraStitch:
         except Exception as e:
             # fall back to a reasonable default if logging config fails
             logger.add("blink_multicam.log", rotation="10 MB", level="INFO")
+        configure_progress_logging()
 
         # cache dir used by extract/cluster helpers (optional)
         self.cache_dir = Path(self.config.get("cache_dir", ".cache"))
@@ -89,35 +130,64 @@ class BlinkMulticameraStitch:
         self.dashboard = Dashboard(self.state)
         self.error_manager = ErrorManager(self.state)
         self.pipeline = None
+        self._last_ui_ts = 0.0
 
     def _load_config(self, config_path: str) -> Dict:
         """Load configuration from a YAML file.
 
+        A JSON copy of the parsed config is reused while the YAML's content hash matches the
+        one stored with it, so edits are seen whatever their mtime.
+
         Args:
             config_path: Path to the configuration file
 
         Returns:
             Dictionary containing the configuration
         """
+        # discovery results depend on the config's inputs
+        _cached_discover.cache_clear()
+        cache_path = _config_cache_path(config_path)
         try:
-            with open(config_path, 'r') as f:
-                cfg = yaml.safe_load(f)
-
-            if not isinstance(cfg, dict):
-                logger.error(f"Config file did not contain a mapping (expected dict): {config_path}")
-                sys.exit(1)
-
-            return cfg
-
+            with open(config_path, 'rb') as f:
+                data = f.read()
         except FileNotFoundError:
             logger.error(f"Config file not found: {config_path}")
             sys.exit(1)
+        # hashing the small YAML is far cheaper than parsing it
+        source_hash = hashlib.blake2b(data, digest_size=16).hexdigest()
+        try:
+            cached = read_json(str(cache_path))
+            if (isinstance(cached, dict) and cached.get("source_hash") == source_hash
+                    and isinstance(cached.get("config"), dict)):
+                return cached["config"]
+        except (OSError, ValueError):
+            pass
+        import yaml
+        try:
+            # libyaml's CSafeLoader when PyYAML was built with it; it takes bytes and decodes them itself
+            cfg = yaml.load(data, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
         except yaml.YAMLError as e:
             logger.error(f"Invalid YAML in config file: {config_path}: {e}")
             sys.exit(1)
 
+        if not isinstance(cfg, dict):
+            logger.error(f"Config file did not contain a mapping (expected dict): {config_path}")
+            sys.exit(1)
+
+        _write_config_cache(cache_path, source_hash, cfg)
+        return cfg
+
+    def _report_progress(self, stage: str, done: int, total: int) -> None:
+        """Per-item stage progress, throttled to one dashboard update per 50 ms (the last item always reports)."""
+        now = time.monotonic()
+        if done == total or now - self._last_ui_ts > 0.05:
+            self._last_ui_ts = now
+            self.dashboard.update_stage(stage, "running", done / total)
+
     def _initialize_pipeline(self) -> None:
         """Initialize the speaker diarization pipeline."""
+        from pyannote.audio import Pipeline
+
         try:
             self.pipeline = Pipeline.from_pretrained(
                 self.config["model_path"],
@@ -183,7 +253,10 @@ class BlinkMulticameraStitch:
         # Normalize extensions from config/CLI here so the helper receives a consistent list.
         # Accepted forms: "mp4", ".mp4", "MP4" or a list thereof. We convert to ".mp4" style lower-case.
         vexts = self.config.get("video_extensions")
-        if vexts:
+        if isinstance(vexts, frozenset):
+            # already normalized by the CLI
+            exts = vexts or None
+        elif vexts:
             raw = []
             if isinstance(vexts, str):
                 raw = [e.strip() for e in vexts.split(",") if e.strip()]
@@ -203,14 +276,19 @@ class BlinkMulticameraStitch:
         # Use the canonical helper for discovery. The helper implements the per-input non-recursive
         # fallback to immediate subdirectories (shallow, per-input behavior) so we avoid duplicating
         # that logic here. This keeps multi-root handling simple and unambiguous.
-        discovered = discover_media_paths(paths, recursive=recursive, exts=exts)
+        # Repeated calls with the same inputs reuse the previous walk (see _cached_discover).
+        discovered = list(_cached_discover(frozenset(map(str, paths)), bool(recursive),
+                                           frozenset(exts) if exts else None))
 
         # If helper returned nothing and legacy audio_dir is present, preserve legacy glob fallback
         if not discovered and self.config.get("audio_dir"):
-            audio_dir = Path(self.config["audio_dir"])
-            if audio_dir.exists():
-                audio_files = list(audio_dir.glob("*.wav")) + list(audio_dir.glob("*.flac"))
-                discovered = [str(f.resolve()) for f in audio_files]
+            audio_dir = self.config["audio_dir"]
+            if os.path.isdir(audio_dir):
+                # one directory pass for both suffixes; dotfiles (e.g. AppleDouble "._x.wav") are skipped as glob did
+                with os.scandir(audio_dir) as it:
+                    discovered = sorted(os.path.realpath(e.path) for e in it
+                                        if not e.name.startswith(".")
+                                        and os.path.splitext(e.name)[1].lower() in PREFERRED_AUDIO_EXTS and e.is_file())
 
         # When non-recursive discovery returns mixed media, prefer audio files (.wav/.flac).
         # Rationale: for shallow scans users commonly want standalone audio captures (e.g. .wav/.flac)
@@ -218,10 +296,11 @@ class BlinkMulticameraStitch:
         # non-recursive discovery and only when top-level discovery yields any audio files, in order
         # to preserve the documented semantics for audio-first shallow scans.
         if not recursive and discovered:
-            audio_only = [p for p in discovered if Path(p).suffix.lower() in {".wav", ".flac"}]
+            audio_only = [p for p in discovered if os.path.splitext(p)[1].lower() in PREFERRED_AUDIO_EXTS]
             if audio_only:
                 discovered = audio_only
-        discovered = sorted(discovered)
+        # already sorted: discover_media_paths returns a sorted list, the fallback sorts its own
+        # scan, and the audio-only filter preserves order
 
         # Logging: number discovered and sample first/last
         if discovered:
@@ -248,26 +327,37 @@ class BlinkMulticameraStitch:
         if not self.pipeline:
             raise RuntimeError("Pipeline not initialized")
 
+        from pyannote.audio import Audio
+
         results = {}
+        audio = Audio(mono="downmix")
 
-        for audio_file in audio_files:
-            try:
-                # Update stage status
-                self.dashboard.update_stage("processing", "running", 0.0)
+        def load(path: str) -> dict:
+            # same decode the pipeline would do itself; handing it the waveform skips that step
+            waveform, sample_rate = audio(path)
+            return {"waveform": waveform, "sample_rate": sample_rate, "uri": Path(path).stem}
 
-                # Process the audio file
-                annotation = self.pipeline(audio_file)
+        # decode the next file on a background thread while the pipeline runs on the current one
+        with ThreadPoolExecutor(max_workers=1) as loader:
+            # Update stage status
+            self.dashboard.update_stage("processing", "running", 0.0)
+            pending = loader.submit(load, audio_files[0]) if audio_files else None
+            for idx, audio_file in enumerate(audio_files):
+                current = pending
+                pending = loader.submit(load, audio_files[idx + 1]) if idx + 1 < len(audio_files) else None
+                try:
+                    # Process the audio file
+                    annotation = self.pipeline(current.result())
 
-                # Update progress
-                progress = (audio_files.index(audio_file) + 1) / len(audio_files)
-                self.dashboard.update_stage("processing", "running", progress)
+                    # Update progress
+                    self._report_progress("processing", idx + 1, len(audio_files))
 
-                results[audio_file] = annotation
+                    results[audio_file] = annotation
 
-            except Exception as e:
-                self.error_manager.report_error("fatal", str(e), "audio_processing")
-                self.dashboard.add_error("fatal", str(e), "processing")
-                continue
+                except Exception as e:
+                    self.error_manager.report_error("fatal", str(e), "audio_processing")
+                    self.dashboard.add_error("fatal", str(e), "processing")
+                    continue
 
         return results
 
@@ -284,32 +374,18 @@ class BlinkMulticameraStitch:
             output_dir = Path(self.config["output_dir"])
             output_dir.mkdir(parents=True, exist_ok=True)
 
-            # Process each annotation
-            for i, (audio_file, annotation) in enumerate(annotations.items()):
-                # Create output file path
-                file_name = Path(audio_file).stem
-                output_file = output_dir / f"{file_name}_output.json"
-
-                # Save annotation to JSON
-                with open(output_file, 'w') as f:
-                    # Convert annotation to dict using supported method
-                    annotation_dict = {
-                        "segments": [
-                            {
-                                "start": segment.start,
-                                "end": segment.end,
-                                "segment": segment,
-                                "track": track,
-                                "label": label
-                            }
-                            for segment, track, label in annotation.itertracks(yield_label=True) # pyright: ignore[reportAssignmentType]
-                        ]
-                    }
-                    json.dump(annotation_dict, f, indent=2)
-
-                # Update progress
-                progress = (i + 1) / len(annotations)
-                self.dashboard.update_stage("generating", "running", progress)
+            # Write each annotation's JSON on a small thread pool so file I/O for one output
+            # overlaps encoding of the next; progress advances as writes finish. Clips sharing
+            # a stem map to one file, and the last one wins as with sequential writes.
+            out_dir = str(output_dir)
+            outputs = {os.path.join(out_dir, os.path.splitext(os.path.basename(audio_file))[0] + "_output.json"): annotation
+                       for audio_file, annotation in annotations.items()}
+            with ThreadPoolExecutor(max_workers=max(1, min(4, len(outputs)))) as ex:
+                futures = [ex.submit(write_json_records, output_file, "segments", _segment_records(annotation))
+                           for output_file, annotation in outputs.items()]
+                for i, fut in enumerate(as_completed(futures)):
+                    fut.result()
+                    self._report_progress("generating", i + 1, len(outputs))
 
             # Mark stage as completed
             self.dashboard.update_stage("generating", "completed", 1.0)
@@ -354,6 +430,7 @@ class BlinkMulticameraStitch:
 
         except Exception as e:
             logger.error(f"Pipeline failed: {str(e)}")
+            self.error_manager.report_error(ErrorType.FATAL, str(e), "pipeline")
             self.dashboard.add_error("fatal", str(e), "pipeline")
             sys.exit(1)
 
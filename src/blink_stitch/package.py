@@ -4,9 +4,10 @@ Packaging functions for Blink multicam stitching.
 """
 
 from typing import Any, Dict, List, Tuple
-import os, json, time, random
+import os, time, random
 from collections import defaultdict
-from .helpers import ensure_dir, clip_to_segment_wav
+import soundfile as sf
+from .helpers import ensure_dir, clip_to_segment_wavs, load_embs, load_wav_cached, write_json
 
 def export_voicepack(turns: List[Dict[str, Any]], out_dir: str, per_speaker_clips: int = 8, clip_seconds: Tuple[float,float]=(2.5,6.0)) -> str:
     """
@@ -21,8 +22,12 @@ def export_voicepack(turns: List[Dict[str, Any]], out_dir: str, per_speaker_clip
         if (t["abs_end"] - t["abs_start"]) >= clip_seconds[0]:
             by_spk[spk].append(i)
 
+    X = load_embs(turns) if by_spk else None
     manifest = {"schema":"voicepack/v1","generated_at": time.time(), "speakers":{}}
     rng = random.Random(42)
+    # segments to cut, grouped per source clip so each clip is decoded once
+    cuts: Dict[str, List[Tuple[float, float, str]]] = defaultdict(list)
+    clip_wavs: Dict[str, str] = {}
     for spk, idxs in by_spk.items():
         rng.shuffle(idxs)
         sel = idxs[:per_speaker_clips]
@@ -32,16 +37,26 @@ def export_voicepack(turns: List[Dict[str, Any]], out_dir: str, per_speaker_clip
             t = turns[i]
             dur = min(clip_seconds[1], t["end"] - t["start"])
             wav_out = os.path.join(spk_dir, f"{spk}_{k:02d}.wav")
-            clip_to_segment_wav(t["clip_path"], t["start"], t["start"] + dur, wav_out)
+            cuts[t["clip_path"]].append((t["start"], t["start"] + dur, wav_out))
+            if t.get("wav_path"): clip_wavs[t["clip_path"]] = t["wav_path"]
             items.append({
                 "wav": os.path.relpath(wav_out, out_dir),
                 "text": t["text"],
                 "abs_start": t["abs_start"], "abs_end": t["abs_end"],
                 "paralinguistics": t.get("paralinguistics", {}),
-                "embedding": t["emb"],  # pyannote vector; useful as fingerprint
+                "embedding": X[i],  # pyannote vector; useful as fingerprint
             })
         manifest["speakers"][spk] = {"clips": items}
+    for clip_path, segments in cuts.items():
+        wav = clip_wavs.get(clip_path)
+        if wav and os.path.exists(wav):
+            # slice the 16k mono WAV cached by process_one_clip in memory
+            samples, sr = load_wav_cached(wav)
+            for start, end, wav_out in segments:
+                lo = int(round(start * sr)); hi = max(lo + 1, int(round(end * sr)))
+                sf.write(wav_out, samples[lo:hi], sr)
+        else:
+            clip_to_segment_wavs(clip_path, segments)
     man_path = os.path.join(out_dir, "manifest.json")
-    with open(man_path, "w", encoding="utf-8") as f:
-        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    write_json(man_path, manifest, indent=True)
     return man_path
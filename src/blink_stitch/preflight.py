@@ -3,58 +3,118 @@
 Preflight and survey functions for Blink multicam stitching.
 """
 
-from typing import Any, Dict, List
+import json
+import os
+import re
+import sqlite3
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
 import numpy as np
-from rich.console import Console
-from rich.table import Table
-from rich import box
 
 from .helpers import ffprobe_meta, get_camera_id
 
+def _probe_key(path: str) -> str:
+    """Cache key for ffprobe output: the file changes if its size or mtime does."""
+    st = os.stat(path)
+    return f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}"
+
+def _open_probe_cache(cache_dir: str) -> Optional[sqlite3.Connection]:
+    """The ffprobe cache, or None when cache_dir can't hold it (probing then runs uncached)."""
+    db = None
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        db = sqlite3.connect(os.path.join(cache_dir, "ffprobe.sqlite"))
+        db.execute("CREATE TABLE IF NOT EXISTS ffprobe (key TEXT PRIMARY KEY, meta TEXT NOT NULL)")
+        return db
+    except (sqlite3.Error, OSError):
+        if db is not None:
+            db.close()
+        return None
+
 def survey(paths: List[str], cfg: Dict[str, Any]) -> Dict[str, Any]:
-    durations: list[float] = []
     cameras = set()
     sample_rates = set()
     problems = []
-    for p in paths[:200]:  # sample first 200 for speed
+    sample = paths[:200]  # sample first 200 for speed
+    # resolve the camera settings (and compile the regex) once for the whole sample
+    camera_from = cfg["camera_from"]
+    cam_regex = re.compile(cfg["filename_regex"]) if camera_from == "regex" and cfg["filename_regex"] else cfg["filename_regex"]
+    # durations fill a preallocated array; n counts the files that probed successfully
+    durations = np.empty(len(sample), dtype=np.float64)
+    n = 0
+    # ffprobe results persist in <cache_dir>/ffprobe.sqlite keyed by (path, size, mtime_ns)
+    keys: Dict[str, str] = {}
+    for p in sample:
         try:
-            m = ffprobe_meta(p)
-            fmt = m.get("format", {})
-            dur = float(fmt.get("duration", 0.0))
-            durations.append(dur)
-            cams = get_camera_id(p, cfg["camera_from"], cfg["filename_regex"])
-            cameras.add(cams)
-            # audio stream sr if present
-            for s in m.get("streams", []):
-                if s.get("codec_type") == "audio":
-                    sr = int(s.get("sample_rate", 0) or 0)
-                    if sr: sample_rates.add(sr)
-        except Exception as e:
-            problems.append(f"{p}: {e}")
-    est_total = sum(durations) * (len(paths)/max(1,len(durations)))
+            keys[p] = _probe_key(p)
+        except OSError:
+            pass
+    db = _open_probe_cache(cfg.get("cache_dir", ".cache"))
+    try:
+        cached: Dict[str, str] = {}
+        if db is not None and keys:
+            q = "SELECT key, meta FROM ffprobe WHERE key IN (%s)" % ",".join("?" * len(keys))
+            try:
+                cached = dict(db.execute(q, list(keys.values())))
+            except sqlite3.Error:
+                pass
+        misses = [p for p in sample if keys.get(p) not in cached]
+        new_rows = []
+        # each ffprobe is a separate process; overlap them (results are consumed in input order)
+        with ThreadPoolExecutor(max_workers=max(1, min(int(cfg.get("preflight_workers", 16)), len(misses)))) as ex:
+            futures = {p: ex.submit(ffprobe_meta, p) for p in misses}
+            for p in sample:
+                try:
+                    key = keys.get(p)
+                    if p in futures:
+                        m = futures[p].result()
+                        if key: new_rows.append((key, json.dumps(m)))
+                    else:
+                        m = json.loads(cached[key])
+                    fmt = m.get("format", {})
+                    durations[n] = float(fmt.get("duration", 0.0))
+                    n += 1
+                    cams = get_camera_id(p, camera_from, cam_regex)
+                    cameras.add(cams)
+                    # audio stream sr if present
+                    for s in m.get("streams", []):
+                        if s.get("codec_type") == "audio":
+                            sr = int(s.get("sample_rate", 0) or 0)
+                            if sr: sample_rates.add(sr)
+                except Exception as e:
+                    problems.append(f"{p}: {e}")
+        if db is not None and new_rows:
+            try:
+                with db:
+                    db.executemany("INSERT OR REPLACE INTO ffprobe (key, meta) VALUES (?, ?)", new_rows)
+            except sqlite3.Error:
+                pass
+    finally:
+        if db is not None:
+            db.close()
+    d = durations[:n]
+    est_total = float(d.sum()) * (len(paths)/max(1,n))
     seconds = int(est_total)
     return {
         "files": len(paths),
         "cameras": sorted(cameras),
-        "dur_sample": durations[:5],
-        "dur_median": float(np.median(durations)) if durations else 0.0,
+        "dur_sample": d[:5].tolist(),
+        "dur_median": float(np.median(d)) if n else 0.0,
         "dur_est_total_s": seconds,
         "sample_rates": sorted(sample_rates),
         "problems": problems[:5],
     }
 
 def print_plan(sv: Dict[str, Any], cfg: Dict[str, Any]):
-
-    console = Console()
-    tbl = Table(title="Preflight Survey", box=box.SIMPLE_HEAVY)
-    tbl.add_column("Field", style="bold")
-    tbl.add_column("Value")
-    tbl.add_row("Files found", str(sv["files"]))
-    tbl.add_row("Cameras", ", ".join(sv["cameras"]) or "n/a")
-    tbl.add_row("Median clip dur (s)", f"{sv['dur_median']:.2f}")
     hrs = sv["dur_est_total_s"] / 3600.0
-    tbl.add_row("Estimated total audio (h)", f"{hrs:.2f}")
-    tbl.add_row("Audio sample rates", ", ".join(map(str, sv["sample_rates"])) or "n/a")
+    rows = [
+        ("Files found", str(sv["files"])),
+        ("Cameras", ", ".join(sv["cameras"]) or "n/a"),
+        ("Median clip dur (s)", f"{sv['dur_median']:.2f}"),
+        ("Estimated total audio (h)", f"{hrs:.2f}"),
+        ("Audio sample rates", ", ".join(map(str, sv["sample_rates"])) or "n/a"),
+    ]
     adjust = []
     if cfg["workers"] > 1:
         adjust.append("Clustering/dedupe will run single-process (auto).")
@@ -66,5 +126,21 @@ def print_plan(sv: Dict[str, Any], cfg: Dict[str, Any]):
         adjust.append("inaSpeechSegmenter not installed; music/TV filtering disabled.")
     if cfg["whisperx"] and not cfg.get("HAVE_WHISPERX", False):
         adjust.append("WhisperX not installed; word-level alignment disabled.")
-    tbl.add_row("Auto adjustments", "\n".join(adjust) or "None")
+    rows.append(("Auto adjustments", "\n".join(adjust) or "None"))
+
+    # redirected output (logs, pipes) gets plain lines; rich is only imported for a terminal
+    if not sys.stdout.isatty():
+        print("Preflight Survey")
+        print("\n".join(f"{k}: " + v.replace("\n", "\n    ") for k, v in rows))
+        return
+    from rich.console import Console
+    from rich.table import Table
+    from rich import box
+
+    console = Console()
+    tbl = Table(title="Preflight Survey", box=box.SIMPLE_HEAVY)
+    tbl.add_column("Field", style="bold")
+    tbl.add_column("Value")
+    for k, v in rows:
+        tbl.add_row(k, v)
     console.print(tbl)
@@ -4,20 +4,21 @@ This module provides error classification, automatic retry mechanisms,
 and context-aware remediation suggestions for pipeline errors.
 """
 
-from typing import Dict, List, Optional, Type, Union
+from typing import Dict, List, Optional, Tuple, Union
 from enum import Enum, auto
-from datetime import datetime
+import sys
 import time
 import random
+import functools
+import heapq
+import itertools
+import threading
 from dataclasses import dataclass
 from abc import ABC, abstractmethod
 import logging
 from loguru import logger
 from progress.state import PipelineState
 
-# Configure logging
-logger.add("progress.log", rotation="10 MB")
-
 class ErrorType(Enum):
     """Enumeration of error types for classification."""
     RECOVERABLE = auto()
@@ -25,16 +26,28 @@ class ErrorType(Enum):
     WARNING = auto()
     INFO = auto()
 
+# Enum member .name goes through a descriptor; a plain dict lookup is cheaper on error paths
+_ERROR_TYPE_NAME = {e: e.name for e in ErrorType}
+
 @dataclass
 class Error:
     """Data class representing an error with context information."""
     type: ErrorType
     message: str
     stage: str
-    timestamp: datetime
+    timestamp: int  # time.time_ns()
     details: Optional[Dict] = None
     retry_count: int = 0
-    last_attempt: Optional[datetime] = None
+    last_attempt: Optional[int] = None  # time.time_ns()
+
+    def __post_init__(self):
+        # stage names are reused as dict keys in the pipeline state
+        self.stage = sys.intern(self.stage)
+
+@dataclass
+class RetryDecision:
+    """Returned by a handler to ask ErrorManager to retry at a time.monotonic() deadline."""
+    retry_at: float
 
 class ErrorHandler(ABC):
     """Abstract base class for error handlers."""
@@ -74,25 +87,26 @@ class BaseErrorHandler(ErrorHandler):
         """
         self.state = state
 
-    def handle(self, error: Error) -> bool:
+    def handle(self, error: Error) -> Union[bool, RetryDecision]:
         """Handle an error and attempt recovery.
 
         Args:
             error: Error object to handle
 
         Returns:
-            bool: True if the error was successfully handled, False otherwise
+            bool: True if the error was successfully handled, False otherwise,
+            or a RetryDecision if recovery should be retried later
         """
         if error.type == ErrorType.RECOVERABLE:
             # Record the error attempt
             error.retry_count += 1
-            error.last_attempt = datetime.now()
+            error.last_attempt = time.time_ns()
 
             # Record the error in the state
             self.state.record_event(
                 "error",
                 {
-                    "type": error.type.name,
+                    "type": _ERROR_TYPE_NAME[error.type],
                     "message": error.message,
                     "stage": error.stage,
                     "retry_count": error.retry_count,
@@ -106,18 +120,8 @@ class BaseErrorHandler(ErrorHandler):
             except Exception as e:
                 logger.error(f"Recovery attempt failed: {str(e)}")
                 return False
-        else:
-            # For non-recoverable errors, just record them
-            self.state.record_event(
-                "error",
-                {
-                    "type": error.type.name,
-                    "message": error.message,
-                    "stage": error.stage,
-                    "details": error.details or {}
-                }
-            )
-            return False
+        # Non-recoverable errors are already recorded by ErrorManager.report_error
+        return False
 
     def _attempt_recovery(self, error: Error) -> bool:
         """Attempt to recover from the error.
@@ -168,7 +172,7 @@ class ResourceExhaustionHandler(BaseErrorHandler):
             logger.info(f"Attempting to free up memory for stage {error.stage}")
             # Here you would implement actual memory cleanup logic
             # For example, clearing caches, releasing unused resources, etc.
-            time.sleep(2)  # Simulate cleanup time
+            # (no simulated delay: this runs on the thread that reported the error)
 
             # Check if memory was successfully freed
             # This is a simulation - in a real implementation you would check actual memory usage
@@ -181,7 +185,6 @@ class ResourceExhaustionHandler(BaseErrorHandler):
             # Try to reduce CPU usage
             logger.info(f"Attempting to reduce CPU usage for stage {error.stage}")
             # Here you would implement actual CPU usage reduction logic
-            time.sleep(2)  # Simulate reduction time
 
             # Check if CPU usage was successfully reduced
             new_usage = current_usage * 0.8  # Assume we reduced CPU usage by 20%
@@ -206,97 +209,86 @@ class ResourceExhaustionHandler(BaseErrorHandler):
         resource = error.details["resource"] if error.details else None
         current_usage = error.details.get("current_usage", 0)
         max_usage = error.details.get("max_usage", 100)
-
+        try:
+            return self._suggestion(error.stage, resource, current_usage, max_usage)
+        except TypeError:
+            # unhashable detail values can't be cached
+            return self._suggestion.__wrapped__(error.stage, resource, current_usage, max_usage)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=64)
+    def _suggestion(stage: str, resource, current_usage, max_usage) -> str:
+        """Build the suggestion text; memoized since error storms repeat the same fields."""
         if resource == "memory":
-            return (f"Memory exhaustion detected in stage {error.stage}. "
+            return (f"Memory exhaustion detected in stage {stage}. "
                     f"Current usage: {current_usage}%, Max usage: {max_usage}%. "
                     "Consider reducing memory usage by: "
                     "1. Processing smaller chunks of data at a time "
                     "2. Clearing unused variables and objects "
                     "3. Using more memory-efficient data structures")
         elif resource == "cpu":
-            return (f"CPU exhaustion detected in stage {error.stage}. "
+            return (f"CPU exhaustion detected in stage {stage}. "
                     f"Current usage: {current_usage}%, Max usage: {max_usage}%. "
                     "Consider reducing CPU usage by: "
                     "1. Implementing rate limiting "
                     "2. Using more efficient algorithms "
                     "3. Parallelizing tasks where possible")
         else:
-            return (f"Resource exhaustion detected in stage {error.stage} for {resource}. "
+            return (f"Resource exhaustion detected in stage {stage} for {resource}. "
                     "Consider reducing resource usage by optimizing the implementation.")
 
 class TemporaryFailureHandler(BaseErrorHandler):
     """Handler for temporary failure errors."""
 
-    def _attempt_recovery(self, error: Error) -> bool:
-        """Attempt to recover from a temporary failure error.
+    def _attempt_recovery(self, error: Error) -> Union[bool, RetryDecision]:
+        """Decide when to retry a temporary failure error.
+
+        Rather than sleeping, returns a RetryDecision that ErrorManager schedules on its
+        retry worker, so the calling pipeline thread is never blocked.
 
         Args:
             error: Error object to attempt recovery for
 
         Returns:
-            bool: True if recovery was successful, False otherwise
+            RetryDecision with the monotonic retry time, or False if retries are exhausted
         """
-        if "retry_after" in (error.details or {}):
-            retry_after = error.details["retry_after"] if error.details else None
-            current_time = datetime.now().timestamp()
- 
-            if retry_after and current_time < retry_after:
-                # Wait until the retry time
-                wait_time = max(0, retry_after - current_time)
-                logger.info(f"Waiting {wait_time:.1f} seconds before retrying stage {error.stage}")
-                time.sleep(wait_time)
- 
-                # If the caller provided a post-retry check callable in error.details, call it to decide success.
-                post_check = None
-                if error.details and isinstance(error.details, dict):
-                    post_check = error.details.get("post_retry_check")
- 
-                if callable(post_check):
-                    try:
-                        return bool(post_check())
-                    except Exception as e:
-                        logger.error(f"post_retry_check failed for stage {error.stage}: {e}")
-                        return False
-                # Default: indicate that the manager should treat this as a scheduled retry (handled)
-                return True
-
-        # Exponential backoff for retries. Allow overrides via error.details.
+        details = error.details if isinstance(error.details, dict) else {}
+        retry_after = details.get("retry_after")
+        if retry_after:
+            wait_time = retry_after - time.time()
+            if wait_time > 0:
+                logger.info(f"Scheduling retry of stage {error.stage} in {wait_time:.1f} seconds")
+                return RetryDecision(retry_at=time.monotonic() + wait_time)
+
+        # Exponential backoff with jitter for retries. Allow overrides via error.details.
         DEFAULT_MAX_RETRIES = 3
         DEFAULT_BASE_DELAY = 2.0  # seconds
- 
+        DEFAULT_MAX_DELAY = 30.0  # seconds
+        DEFAULT_JITTER = 0.5
+
         max_retries = DEFAULT_MAX_RETRIES
         base_delay = DEFAULT_BASE_DELAY
-        if error.details and isinstance(error.details, dict):
-            try:
-                max_retries = int(error.details.get("max_retries", max_retries))
-            except Exception:
-                pass
-            try:
-                base_delay = float(error.details.get("base_delay", base_delay))
-            except Exception:
-                pass
- 
-        # Only attempt a delayed retry if we haven't exhausted retry attempts
+        max_delay = DEFAULT_MAX_DELAY
+        try:
+            max_retries = int(details.get("max_retries", max_retries))
+        except Exception:
+            pass
+        try:
+            base_delay = float(details.get("base_delay", base_delay))
+        except Exception:
+            pass
+        try:
+            max_delay = float(details.get("max_delay", max_delay))
+        except Exception:
+            pass
+
+        # Only schedule a delayed retry if we haven't exhausted retry attempts
         if error.retry_count <= max_retries:
             # compute delay using (retry_count - 1) so first retry is base_delay
-            delay = base_delay * (2 ** max(0, error.retry_count - 1))
-            logger.info(f"Retrying stage {error.stage} in {delay} seconds (attempt {error.retry_count}/{max_retries})")
-            time.sleep(delay)
- 
-            # If a post-retry check callable is provided, use it to determine success.
-            post_check = None
-            if error.details and isinstance(error.details, dict):
-                post_check = error.details.get("post_retry_check")
- 
-            if callable(post_check):
-                try:
-                    return bool(post_check())
-                except Exception as e:
-                    logger.error(f"post_retry_check failed for stage {error.stage}: {e}")
-                    return False
-            # Default to signalling that a retry was scheduled/attempted.
-            return True
+            delay = base_delay * (2 ** max(0, error.retry_count - 1)) * (1 + random.uniform(0, DEFAULT_JITTER))
+            delay = min(max_delay, delay)
+            logger.info(f"Retrying stage {error.stage} in {delay:.1f} seconds (attempt {error.retry_count}/{max_retries})")
+            return RetryDecision(retry_at=time.monotonic() + delay)
 
         return False
 
@@ -311,22 +303,40 @@ class TemporaryFailureHandler(BaseErrorHandler):
         """
         if "retry_after" in (error.details or {}):
             retry_after = error.details["retry_after"] if error.details else None
-            current_time = datetime.now().timestamp()
             if retry_after is not None:
-                wait_time = max(0, retry_after - current_time)
-                if wait_time > 0:
-                    return (f"Temporary failure detected in stage {error.stage}. "
-                            f"Service will be available again in approximately {wait_time:.1f} seconds. "
-                            "The system will automatically retry after this period.")
-                else:
-                    return (f"Temporary failure detected in stage {error.stage}. "
-                            "The system will automatically retry the operation.")
-            else:
-                return (f"Temporary failure detected in stage {error.stage}. "
-                        "The system will automatically retry the operation.")
-        else:
-            return (f"Temporary failure detected in stage {error.stage}. "
+                wait_time = max(0, retry_after - time.time())
+                # bucket to whole seconds so repeated errors share a cache entry
+                return self._suggestion(error.stage, max(1, round(wait_time)) if wait_time > 0 else 0)
+            return self._suggestion(error.stage, 0)
+        return self._suggestion(error.stage, None)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=64)
+    def _suggestion(stage: str, wait_secs: Optional[int]) -> str:
+        """Build the suggestion text; wait_secs is whole seconds, or None when no retry_after was given."""
+        if wait_secs is None:
+            return (f"Temporary failure detected in stage {stage}. "
                     "The system will automatically retry the operation with exponential backoff.")
+        if wait_secs > 0:
+            return (f"Temporary failure detected in stage {stage}. "
+                    f"Service will be available again in approximately {wait_secs} seconds. "
+                    "The system will automatically retry after this period.")
+        return (f"Temporary failure detected in stage {stage}. "
+                "The system will automatically retry the operation.")
+
+# Handlers are keyed by ErrorType, or by (ErrorType, discriminator) where the discriminator
+# is the first of these detail fields present on the error
+_DISCRIMINATORS = ("resource", "retry_after")
+
+HandlerKey = Union[ErrorType, Tuple[ErrorType, str]]
+
+def _handler_key(error: Error) -> Tuple[ErrorType, Optional[str]]:
+    """Return the (ErrorType, discriminator) lookup key for an error."""
+    details = error.details or {}
+    for field in _DISCRIMINATORS:
+        if field in details:
+            return (error.type, field)
+    return (error.type, None)
 
 class ErrorManager:
     """Manager for handling errors in the pipeline."""
@@ -338,20 +348,32 @@ class ErrorManager:
             state: PipelineState instance for tracking pipeline progress
         """
         self.state = state
-        self.handlers: Dict[Type, ErrorHandler] = {
-            ResourceExhaustionHandler: ResourceExhaustionHandler(state),
-            TemporaryFailureHandler: TemporaryFailureHandler(state)
+        temporary = TemporaryFailureHandler(state)
+        self.handlers: Dict[HandlerKey, ErrorHandler] = {
+            (ErrorType.RECOVERABLE, "resource"): ResourceExhaustionHandler(state),
+            (ErrorType.RECOVERABLE, "retry_after"): temporary,
+            ErrorType.RECOVERABLE: temporary
         }
+        # Pending retries as a heap of (retry_at, seq, error), run by one background worker
+        self._retries: List[Tuple[float, int, Error]] = []
+        self._retry_seq = itertools.count()
+        self._retry_cond = threading.Condition()
+        self._retry_worker: Optional[threading.Thread] = None
 
-    def add_handler(self, error_type: Type[Error], handler: ErrorHandler) -> None:
+    def add_handler(self, error_type: HandlerKey, handler: ErrorHandler) -> None:
         """Add a custom error handler for a specific error type.
 
         Args:
-            error_type: Type of error to handle
+            error_type: ErrorType to handle, or an (ErrorType, discriminator) pair
+                where the discriminator is one of the detail fields "resource"/"retry_after"
             handler: ErrorHandler instance to use for this error type
         """
         self.handlers[error_type] = handler
 
+    def _find_handler(self, error: Error) -> Optional[ErrorHandler]:
+        """Look up the handler for an error: the discriminated key first, then its ErrorType."""
+        return self.handlers.get(_handler_key(error)) or self.handlers.get(error.type)
+
     def handle_error(self, error: Error) -> bool:
         """Handle an error using the appropriate handler.
 
@@ -359,20 +381,65 @@ class ErrorManager:
             error: Error object to handle
 
         Returns:
-            bool: True if the error was successfully handled, False otherwise
+            bool: True if the error was successfully handled or a retry was scheduled,
+            False otherwise
         """
-        # Find the most specific handler for this error type
-        handler = None
-        for error_type, h in self.handlers.items():
-            if isinstance(error, error_type):
-                if handler is None:
-                    handler = h
-
+        handler = self._find_handler(error)
         if handler is None:
-            logger.warning(f"No handler found for error type {type(error).__name__}")
+            logger.warning(f"No handler found for error type {_ERROR_TYPE_NAME[error.type]}")
             return False
 
-        return handler.handle(error)
+        return self._dispatch(handler, error)
+
+    def _dispatch(self, handler: ErrorHandler, error: Error) -> bool:
+        """Run a handler, scheduling a retry if it returns a RetryDecision."""
+        result = handler.handle(error)
+        if isinstance(result, RetryDecision):
+            self._schedule_retry(result.retry_at, error)
+            return True
+        return result
+
+    def _schedule_retry(self, retry_at: float, error: Error) -> None:
+        """Queue an error for retry at a time.monotonic() deadline."""
+        with self._retry_cond:
+            heapq.heappush(self._retries, (retry_at, next(self._retry_seq), error))
+            if self._retry_worker is None:
+                self._retry_worker = threading.Thread(target=self._retry_loop, name="error-retry", daemon=True)
+                self._retry_worker.start()
+            self._retry_cond.notify()
+
+    def _retry_loop(self) -> None:
+        """Worker: wait for the earliest due retry and run it."""
+        while True:
+            with self._retry_cond:
+                while not self._retries:
+                    self._retry_cond.wait()
+                wait = self._retries[0][0] - time.monotonic()
+                if wait > 0:
+                    # a newly scheduled earlier retry wakes us via notify()
+                    self._retry_cond.wait(wait)
+                    continue
+                _, _, error = heapq.heappop(self._retries)
+            self._run_retry(error)
+
+    def _run_retry(self, error: Error) -> None:
+        """Run a due retry: a failing post_retry_check re-dispatches the error."""
+        post_check = error.details.get("post_retry_check") if isinstance(error.details, dict) else None
+        if not callable(post_check):
+            # nothing to verify; the retry slot itself is the recovery
+            return
+        try:
+            ok = bool(post_check())
+        except Exception as e:
+            logger.error(f"post_retry_check failed for stage {error.stage}: {e}")
+            ok = False
+        if not ok:
+            self.handle_error(error)
+
+    def pending_retries(self) -> int:
+        """Number of retries scheduled but not yet run."""
+        with self._retry_cond:
+            return len(self._retries)
 
     def get_remediation_suggestion(self, error: Error) -> str:
         """Get a remediation suggestion for an error.
@@ -383,15 +450,9 @@ class ErrorManager:
         Returns:
             str: Remediation suggestion
         """
-        # Find the most specific handler for this error type
-        handler = None
-        for error_type, h in self.handlers.items():
-            if isinstance(error, error_type):
-                if handler is None:
-                    handler = h
-
+        handler = self._find_handler(error)
         if handler is None:
-            logger.warning(f"No handler found for error type {type(error).__name__}")
+            logger.warning(f"No handler found for error type {_ERROR_TYPE_NAME[error.type]}")
             return "No remediation suggestion available for this error type."
 
         return handler.get_remediation_suggestion(error)
@@ -406,24 +467,33 @@ class ErrorManager:
             stage: Stage where the error occurred
             details: Optional details about the error
         """
+        stage = sys.intern(stage)
         error = Error(
             type=error_type,
             message=message,
             stage=stage,
-            timestamp=datetime.now(),
+            timestamp=time.time_ns(),
             details=details
         )
 
-        # Record the error in the state
-        self.state.record_event(
-            "error",
-            {
-                "type": error_type.name,
-                "message": message,
-                "stage": stage,
-                "details": details or {}
-            }
-        )
+        # Record the error in the state; a recoverable error with a handler is recorded
+        # by the handler instead, once per attempt with its retry count
+        handler = self._find_handler(error)
+        if not (error_type == ErrorType.RECOVERABLE and handler is not None):
+            self.state.record_event(
+                "error",
+                {
+                    "type": _ERROR_TYPE_NAME[error_type],
+                    "message": message,
+                    "stage": stage,
+                    "details": details or {}
+                }
+            )
 
-        # Attempt to handle the error
-        self.handle_error(error)
+        # Only dispatch when a handler exists; by default INFO/WARNING/FATAL have none,
+        # so they skip the "no handler" warning entirely
+        if handler is None:
+            if error_type == ErrorType.RECOVERABLE:
+                logger.warning(f"No handler found for error type {_ERROR_TYPE_NAME[error_type]}")
+            return
+        self._dispatch(handler, error)
@@ -0,0 +1,22 @@
+"""Logging sink setup for the blink-multicamera-stitch progress system.
+
+The progress modules log through loguru but do not add sinks on import; the
+application calls configure() once at startup.
+"""
+
+from loguru import logger
+
+_configured = False
+
+def configure(path: str = "progress.log") -> None:
+    """Add the progress log file sink, once per process.
+
+    Args:
+        path: Path of the log file (rotated at 10 MB)
+    """
+    global _configured
+    if _configured:
+        return
+    # enqueue=True hands records to a background thread so callers never block on disk
+    logger.add(path, rotation="10 MB", enqueue=True)
+    _configured = True
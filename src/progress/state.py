@@ -6,30 +6,90 @@ automatic recovery/resumption capabilities, and historical performance metrics.
 
 import json
 import os
+import sys
+import atexit
+import threading
+import time
+import functools
+import weakref
+from collections import deque
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterator, List, Optional
 from datetime import datetime
 from loguru import logger
 
-# Configure logging
-logger.add("progress.log", rotation="10 MB")
+try:
+    import orjson
+    HAVE_ORJSON = True
+except Exception:
+    orjson = None
+    HAVE_ORJSON = False
+
+# Events kept in the snapshot; the journal file holds the full trail
+HISTORY_MAXLEN = 1000
+
+# History is stored as parallel columns (struct-of-arrays) rather than one dict per event
+_HISTORY_COLUMNS = ("timestamps", "types", "details")
+
+@functools.lru_cache(maxsize=4)
+def _iso_seconds(sec: int) -> str:
+    return datetime.fromtimestamp(sec).strftime("%Y-%m-%dT%H:%M:%S")
+
+def _iso_ns(ts: Any) -> Any:
+    """Format a time.time_ns() timestamp as local ISO 8601; other values pass through.
+
+    The seconds prefix is cached, so formatting a burst of events is mostly one lookup.
+    """
+    if not isinstance(ts, int):
+        return ts
+    sec, ns = divmod(ts, 1_000_000_000)
+    return f"{_iso_seconds(sec)}.{ns // 1000:06d}"
+
+def _flush_at_exit(ref: "weakref.ref[PipelineState]") -> None:
+    """atexit hook: flush the state if it is still alive (holds only a weak reference)."""
+    state = ref()
+    if state is not None:
+        state.flush()
+
+def _new_history(events: Optional[List[Dict[str, Any]]] = None) -> Dict[str, deque]:
+    """Build columnar history, optionally from a legacy list of event dicts."""
+    events = events or []
+    return {
+        "timestamps": deque((e.get("timestamp") for e in events), maxlen=HISTORY_MAXLEN),
+        "types": deque((e.get("type") for e in events), maxlen=HISTORY_MAXLEN),
+        "details": deque((e.get("details") for e in events), maxlen=HISTORY_MAXLEN)
+    }
 
 class PipelineState:
     """Manages the state of the pipeline execution with persistence and recovery."""
 
-    def __init__(self, state_file: str = "pipeline_state.json"):
+    def __init__(self, state_file: str = "pipeline_state.json", flush_interval: float = 0.5):
         """Initialize the PipelineState with a state file path.
 
+        Mutations are written behind: they mark the state dirty and a timer saves the
+        snapshot at most once per `flush_interval` seconds. Events are also appended
+        to a line-delimited journal next to the state file, which is truncated whenever
+        a snapshot is written, so it only holds events newer than the snapshot.
+
         Args:
             state_file: Path to the JSON state file
+            flush_interval: Seconds to coalesce mutations before saving the snapshot
         """
         self.state_file = Path(state_file)
+        self.journal_file = self.state_file.with_suffix(".journal.jsonl")
+        self._flush_interval = flush_interval
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._timer: Optional[threading.Timer] = None
+        # weak so the atexit registry doesn't keep every instance alive; close() unregisters it
+        self._atexit_hook = functools.partial(_flush_at_exit, weakref.ref(self))
+        atexit.register(self._atexit_hook)
         self._state: Dict[str, Any] = {
             "stages": {},
             "metrics": {},
             "last_run": None,
             "recovery_point": None,
-            "history": []
+            "history": _new_history()
         }
 
     def load_or_create(self) -> 'PipelineState':
@@ -40,31 +100,101 @@ class PipelineState:
         """
         if self.state_file.exists():
             try:
-                with open(self.state_file, 'r') as f:
-                    self._state = json.load(f)
+                if HAVE_ORJSON:
+                    self._state = orjson.loads(self.state_file.read_bytes())
+                else:
+                    with open(self.state_file, 'r') as f:
+                        self._state = json.load(f)
+                history = self._state.get("history") or []
+                if isinstance(history, dict):
+                    self._state["history"] = {k: deque(history.get(k, []), maxlen=HISTORY_MAXLEN)
+                                              for k in _HISTORY_COLUMNS}
+                else:
+                    self._state["history"] = _new_history(history)
                 logger.info(f"Loaded state from {self.state_file}")
-            except (json.JSONDecodeError, IOError) as e:
+            except (ValueError, IOError) as e:
                 logger.warning(f"Failed to load state: {e}. Creating new state.")
                 self._state = {
                     "stages": {},
                     "metrics": {},
                     "last_run": None,
                     "recovery_point": None,
-                    "history": []
+                    "history": _new_history()
                 }
         else:
             logger.info(f"Creating new state at {self.state_file}")
 
         return self
 
-    def save(self) -> None:
-        """Save the current state to the state file."""
-        try:
-            with open(self.state_file, 'w') as f:
-                json.dump(self._state, f, indent=2)
-            logger.info(f"Saved state to {self.state_file}")
-        except IOError as e:
-            logger.error(f"Failed to save state: {e}")
+    def save(self, indent: bool = False) -> None:
+        """Save the current state to the state file.
+
+        Args:
+            indent: Pretty-print the snapshot; routine saves write compact JSON
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            tmp = self.state_file.with_suffix(".tmp")
+            try:
+                history = self._state["history"]
+                recovery = self._state["recovery_point"]
+                if recovery:
+                    recovery = {**recovery, "timestamp": _iso_ns(recovery.get("timestamp"))}
+                snapshot = {**self._state, "recovery_point": recovery, "history": {
+                    "timestamps": [_iso_ns(ts) for ts in history["timestamps"]],
+                    "types": list(history["types"]),
+                    "details": list(history["details"])
+                }}
+                if HAVE_ORJSON:
+                    with open(tmp, 'wb') as f:
+                        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+                        f.write(orjson.dumps(snapshot, default=str, option=option))
+                else:
+                    with open(tmp, 'w') as f:
+                        if indent:
+                            json.dump(snapshot, f, indent=2, default=str)
+                        else:
+                            json.dump(snapshot, f, separators=(',', ':'), default=str)
+                os.replace(tmp, self.state_file)
+                # the snapshot now covers every journaled event
+                self.journal_file.unlink(missing_ok=True)
+                self._dirty = False
+                logger.info(f"Saved state to {self.state_file}")
+            except IOError as e:
+                logger.error(f"Failed to save state: {e}")
+
+    def checkpoint(self) -> None:
+        """Save a human-readable (indented) snapshot now."""
+        self.save(indent=True)
+
+    def flush(self) -> None:
+        """Save the state now if there are unsaved mutations."""
+        with self._lock:
+            if self._dirty:
+                self.save()
+
+    def close(self) -> None:
+        """Flush pending mutations and drop the atexit hook."""
+        self.flush()
+        atexit.unregister(self._atexit_hook)
+
+    def _mark_dirty(self) -> None:
+        """Mark the state as modified and schedule a save if none is pending."""
+        with self._lock:
+            self._dirty = True
+            if self._timer is None:
+                self._timer = threading.Timer(self._flush_interval, self._flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _flush(self) -> None:
+        """Timer callback: save the coalesced mutations."""
+        with self._lock:
+            self._timer = None
+            if self._dirty:
+                self.save()
 
     def update_stage(self, stage_name: str, status: str, progress: float = 0.0,
                     start_time: Optional[datetime] = None,
@@ -78,25 +208,28 @@ class PipelineState:
             start_time: Optional datetime when the stage started
             end_time: Optional datetime when the stage ended
         """
-        if stage_name not in self._state["stages"]:
-            self._state["stages"][stage_name] = {}
-
-        self._state["stages"][stage_name].update({
-            "status": status,
-            "progress": progress,
-            "start_time": start_time.isoformat() if start_time else None,
-            "end_time": end_time.isoformat() if end_time else None
-        })
-
-        # Update metrics if stage is completed
-        if status == "completed" and start_time and end_time:
-            duration = (end_time - start_time).total_seconds()
-            self._state["metrics"][stage_name] = {
-                "duration": duration,
-                "completion_time": end_time.isoformat()
-            }
+        # interned keys hit the identity fast path on repeated dict lookups
+        stage_name = sys.intern(stage_name)
+        with self._lock:
+            if stage_name not in self._state["stages"]:
+                self._state["stages"][stage_name] = {}
+
+            self._state["stages"][stage_name].update({
+                "status": status,
+                "progress": progress,
+                "start_time": start_time.isoformat() if start_time else None,
+                "end_time": end_time.isoformat() if end_time else None
+            })
 
-        self.save()
+            # Update metrics if stage is completed
+            if status == "completed" and start_time and end_time:
+                duration = (end_time - start_time).total_seconds()
+                self._state["metrics"][stage_name] = {
+                    "duration": duration,
+                    "completion_time": end_time.isoformat()
+                }
+
+            self._mark_dirty()
 
     def get_stage_status(self, stage_name: str) -> Dict[str, Any]:
         """Get the status of a specific stage.
@@ -132,18 +265,40 @@ class PipelineState:
             event_type: Type of event (e.g., 'stage_start', 'stage_end', 'error')
             details: Dictionary containing event details
         """
-        event = {
-            "timestamp": datetime.now().isoformat(),
-            "type": event_type,
-            "details": details
-        }
-        self._state["history"].append(event)
+        # integer ns in memory; formatted to ISO 8601 only when serialized
+        ts = time.time_ns()
+        event_type = sys.intern(event_type)
+        with self._lock:
+            # bounded deques: the oldest event is evicted in O(1)
+            history = self._state["history"]
+            history["timestamps"].append(ts)
+            history["types"].append(event_type)
+            history["details"].append(details)
 
-        # Keep history size manageable
-        if len(self._state["history"]) > 1000:
-            self._state["history"] = self._state["history"][-500:]
+            event = {"timestamp": _iso_ns(ts), "type": event_type, "details": details}
 
-        self.save()
+            # The journal keeps every event since the last snapshot; appending is O(1) regardless of history size
+            try:
+                if HAVE_ORJSON:
+                    with open(self.journal_file, 'ab') as f:
+                        f.write(orjson.dumps(event, default=str, option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_NON_STR_KEYS))
+                else:
+                    with open(self.journal_file, 'a') as f:
+                        f.write(json.dumps(event, separators=(',', ':'), default=str) + "\n")
+            except IOError as e:
+                logger.error(f"Failed to append to journal: {e}")
+
+            self._mark_dirty()
+
+    def iter_history(self) -> Iterator[Dict[str, Any]]:
+        """Iterate over the retained events as {"timestamp", "type", "details"} dicts.
+
+        Returns:
+            Iterator over events, oldest first
+        """
+        history = self._state["history"]
+        for ts, event_type, details in zip(history["timestamps"], history["types"], history["details"]):
+            yield {"timestamp": _iso_ns(ts), "type": event_type, "details": details}
 
     def set_recovery_point(self, stage_name: str, progress: float = 0.0) -> None:
         """Set a recovery point for automatic recovery.
@@ -152,12 +307,14 @@ class PipelineState:
             stage_name: Name of the stage to set as recovery point
             progress: Progress percentage at recovery point
         """
-        self._state["recovery_point"] = {
-            "stage": stage_name,
-            "progress": progress,
-            "timestamp": datetime.now().isoformat()
-        }
-        self.save()
+        with self._lock:
+            # time.time_ns() like event timestamps; formatted by save()
+            self._state["recovery_point"] = {
+                "stage": stage_name,
+                "progress": progress,
+                "timestamp": time.time_ns()
+            }
+            self._mark_dirty()
 
     def get_recovery_point(self) -> Optional[Dict[str, Any]]:
         """Get the current recovery point.
@@ -169,5 +326,6 @@ class PipelineState:
 
     def clear_recovery_point(self) -> None:
         """Clear the current recovery point."""
-        self._state["recovery_point"] = None
-        self.save()
+        with self._lock:
+            self._state["recovery_point"] = None
+            self._mark_dirty()
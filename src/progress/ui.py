@@ -4,9 +4,13 @@ This module provides components for displaying pipeline progress, system resourc
 and error information in a rich, interactive interface.
 """
 
+import threading
+import time
+from collections import deque
 from datetime import datetime, timedelta
-import humanize
-from rich.console import RenderableType
+from typing import Any, Deque, Dict, Optional, Tuple
+from rich.console import Console, Group, RenderableType
+from rich.live import Live
 from rich.panel import Panel
 from rich.table import Table
 from rich.progress import (
@@ -19,6 +23,18 @@ from rich.progress import (
 from rich.text import Text
 from progress.state import PipelineState
 
+_fromiso = datetime.fromisoformat
+_DT_FMT = "%Y-%m-%d %H:%M:%S"
+
+def _fmt_dt(dt: datetime) -> str:
+    return dt.strftime(_DT_FMT)
+
+def _format_delta(td: timedelta) -> str:
+    """Compact duration, e.g. "1h 02m 03s" or "2m 03s"."""
+    h, rem = divmod(int(td.total_seconds()), 3600)
+    m, s = divmod(rem, 60)
+    return f"{h}h {m:02}m {s:02}s" if h else f"{m}m {s:02}s"
+
 class StageProgress:
     """Component for displaying the progress of a single pipeline stage."""
 
@@ -27,7 +43,7 @@ class StageProgress:
 
         Args:
             stage_name: Name of the pipeline stage
-            state: PipelineState instance for tracking stage progress
+            state: Source of the stage status via get_stage_status (a PipelineState or the Dashboard)
         """
         self.stage_name = stage_name
         self.state = state
@@ -46,6 +62,25 @@ class StageProgress:
         )
         self.start_time = None
         self.end_time = None
+        # display strings derived from start/end; both times are set once, so these are too
+        self._start_str = None
+        self._end_str = None
+        self._duration_str = None
+        # redraw throttle: progress-only changes rebuild the panel at most every _min_refresh_s
+        self._min_refresh_s = 0.5
+        self._last_refresh = 0.0
+        self._last_completed = -1
+        self._last_status = None
+        # persistent rows (status, progress, started, ended, duration); update() only rewrites their text
+        self._row_texts = [Text() for _ in range(5)]
+        self._info = Table.grid(padding=0)
+        for row in self._row_texts:
+            self._info.add_row(row)
+        self._panel = Panel(
+            Group(self.progress, self._info),
+            title=f"[bold]{stage_name}[/bold]",
+            border_style="blue"
+        )
 
     def update(self) -> RenderableType:
         """Update the progress display based on current state.
@@ -69,55 +104,49 @@ class StageProgress:
 
         # Update start/end times
         if start_time_str and not self.start_time:
-            self.start_time = datetime.fromisoformat(start_time_str)
+            self.start_time = _fromiso(start_time_str)
+            self._start_str = _fmt_dt(self.start_time)
         if end_time_str and not self.end_time:
-            self.end_time = datetime.fromisoformat(end_time_str)
+            self.end_time = _fromiso(end_time_str)
+            self._end_str = _fmt_dt(self.end_time)
+        if self._duration_str is None and self.start_time and self.end_time:
+            self._duration_str = _format_delta(self.end_time - self.start_time)
+
+        # Leave the rows as they are when only the percentage moved and the last refresh was recent;
+        # status changes and completion always refresh
+        completed = int(progress * 100)
+        now = time.monotonic()
+        if (status == self._last_status and completed != 100
+                and (completed == self._last_completed or now - self._last_refresh < self._min_refresh_s)):
+            return self._panel
 
         # Update progress bar
         self.progress.update(
             self.task_id,
-            completed=int(progress * 100),
+            completed=completed,
             total=100,
             visible=True
         )
 
-        # Create status message
-        status_text = Text(f"Status: {status.capitalize()}", style="bold")
-
-        if status == "completed":
-            if self.start_time and self.end_time:
-                duration = humanize.precisedelta(
-                    self.end_time - self.start_time
-                )
-                status_text.append(f" (Completed in {duration})")
-            status_text.stylize("green")
-        elif status == "failed":
-            status_text.stylize("red")
-        elif status == "running":
-            status_text.stylize("yellow")
-
-        # Create progress information
-        progress_info = Table.grid(padding=0)
-        progress_info.add_row(status_text)
-        progress_info.add_row(Text(f"Progress: {progress:.1%}"))
-
-        if self.start_time:
-            progress_info.add_row(Text(f"Started: {self.start_time.strftime('%Y-%m-%d %H:%M:%S')}"))
-        if self.end_time:
-            progress_info.add_row(Text(f"Ended: {self.end_time.strftime('%Y-%m-%d %H:%M:%S')}"))
+        # Status row
+        status_row, progress_row, start_row, end_row, duration_row = self._row_texts
+        status_row.plain = f"Status: {status.capitalize()}"
+        if status == "completed" and self._duration_str:
+            status_row.plain += f" (Completed in {self._duration_str})"
+        status_row.style = {"completed": "bold green", "failed": "bold red", "running": "bold yellow"}.get(status, "bold")
+
+        progress_row.plain = f"Progress: {progress:.1%}"
+        start_row.plain = f"Started: {self._start_str}" if self._start_str else ""
+        end_row.plain = f"Ended: {self._end_str}" if self._end_str else ""
 
         # Add duration if completed
-        if status == "completed" and self.start_time and self.end_time:
-            duration = (self.end_time - self.start_time).total_seconds()
-            progress_info.add_row(Text(f"Duration: {humanize.precisedelta(timedelta(seconds=duration))}"))
+        duration_row.plain = f"Duration: {self._duration_str}" if status == "completed" and self._duration_str else ""
 
-        return Panel(
-            self.progress,
-            title=f"[bold]{self.stage_name}[/bold]",
-            border_style="blue"
-        )
+        self._last_refresh, self._last_completed, self._last_status = now, completed, status
+        return self._panel
 
 class SystemResourcePanel:
+    """Component for displaying system resource utilization."""
     def __init__(self, state):
         self.state = state
 
@@ -135,18 +164,108 @@ class SystemResourcePanel:
 
     def add_error(self, severity, message, stage):
         pass
+
 class Dashboard:
-    """Minimal Dashboard stub for pipeline integration."""
-    def __init__(self, state):
+    """Pipeline dashboard.
+
+    Render-only: update_stage/add_error only queue the change (O(1), no I/O) and never
+    touch the PipelineState; recording errors and stage state is left to ErrorManager and
+    PipelineState. While the dashboard is entered, a background thread drains the queue
+    every tick and redraws once. Outside the context there is no flush thread, so calls
+    are applied immediately.
+    """
+
+    # queued errors kept between ticks; overflow is counted and shown, not silently lost
+    MAX_PENDING_ERRORS = 100
+
+    def __init__(self, state: PipelineState, refresh_hz: float = 4.0):
         self.state = state
+        self._interval = 1.0 / refresh_hz
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Tuple[str, float]] = {}
+        self._pending_errors: Deque[Tuple[str, str, str]] = deque()
+        self._dropped_errors = 0
+        self._errors: Deque[Tuple[str, str, str]] = deque(maxlen=5)
+        self._stages: Dict[str, StageProgress] = {}
+        # display-side stage status in PipelineState's format, read back by StageProgress
+        self._status: Dict[str, Dict[str, Any]] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._live: Optional[Live] = None
+
     def __enter__(self):
+        console = Console()
+        if console.is_terminal:
+            self._live = Live(self._render(), console=console, auto_refresh=False)
+            self._live.start()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="dashboard-refresh", daemon=True)
+        self._thread.start()
         return self
+
     def __exit__(self, exc_type, exc_val, exc_tb):
-        pass
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        # final drain so the last updates reach the screen
+        self._flush()
+        if self._live is not None:
+            self._live.stop()
+            self._live = None
+
     def add_stage(self, name):
-        pass
+        with self._lock:
+            if name not in self._stages:
+                self._stages[name] = StageProgress(name, self)
+
     def update_stage(self, name, status, progress, *args, **kwargs):
-        pass
+        with self._lock:
+            self._pending[name] = (status, progress)
+        if self._thread is None:
+            self._flush()
+
     def add_error(self, severity, message, stage):
-        pass
-    """Component for displaying system resource utilization."""
+        with self._lock:
+            if len(self._pending_errors) >= self.MAX_PENDING_ERRORS:
+                self._pending_errors.popleft()
+                self._dropped_errors += 1
+            self._pending_errors.append((severity, message, stage))
+        if self._thread is None:
+            self._flush()
+
+    def get_stage_status(self, name: str) -> Dict[str, Any]:
+        """Displayed status of a stage, in the shape StageProgress expects."""
+        return self._status.get(name, {})
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval):
+            self._flush()
+
+    def _flush(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            errors = list(self._pending_errors)
+            self._pending_errors.clear()
+        if not pending and not errors:
+            return
+        now = datetime.now().isoformat()
+        for name, (status, progress) in pending.items():
+            entry = self._status.setdefault(name, {"start_time": now, "end_time": None})
+            entry["status"], entry["progress"] = status, progress
+            if status in ("completed", "failed") and entry["end_time"] is None:
+                entry["end_time"] = now
+        self._errors.extend(errors)
+        if self._live is not None:
+            self._live.update(self._render(), refresh=True)
+
+    def _render(self) -> RenderableType:
+        with self._lock:
+            stages = list(self._stages.values())
+            dropped = self._dropped_errors
+        parts = [stage.update() for stage in stages]
+        if self._errors:
+            lines = "\n".join(f"[{sev}] {stage}: {msg}" for sev, msg, stage in self._errors)
+            title = "[bold]Errors[/bold]" + (f" ({dropped} dropped)" if dropped else "")
+            parts.append(Panel(Text(lines), title=title, border_style="red"))
+        return Group(*parts)
@@ -0,0 +1,31 @@
+from pathlib import Path
+import sys
+import pytest
+# Make package importable when tests run from project root:
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+def create_layout(root: Path):
+    p = root
+    (p / "2024-01" / "2024-01-01" / "cam1").mkdir(parents=True)
+    (p / "2024-02" / "2024-02-02").mkdir(parents=True)
+    (p / "day3").mkdir()
+    # create files
+    f1 = p / "2024-01" / "2024-01-01" / "cam1" / "video1.mp4"
+    f1.write_text("dummy")
+    f2 = p / "2024-02" / "2024-02-02" / "video2.MP4"
+    f2.write_text("dummy")
+    f3 = p / "day3" / "video3.mov"
+    f3.write_text("dummy")
+    f4 = p / "some_audio.wav"
+    f4.write_text("dummy")
+    # resolve once per build; assertions compare against these strings
+    return [(f, str(f.resolve())) for f in (f1, f2, f3, f4)]
+
+
+@pytest.fixture(scope="session")
+def media_layout(tmp_path_factory):
+    """Shared read-only media tree; tests that write files use tmp_path instead."""
+    root = tmp_path_factory.mktemp("media_shared")
+    files = create_layout(root)
+    return root, files
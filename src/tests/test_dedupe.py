@@ -0,0 +1,31 @@
+import sys
+from pathlib import Path
+# Make package importable when tests run from project root:
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from blink_stitch.dedupe import hard_dedupe
+
+
+def make_turn(start, end, spk, emb, camera="cam1"):
+    return {"abs_start": start, "abs_end": end, "camera": camera, "spk_global": spk, "emb": emb}
+
+
+def test_hard_dedupe_drops_shorter_overlapping_duplicate():
+    long_turn = make_turn(0.0, 4.0, "spk0", [1.0, 0.0], camera="cam1")
+    short_turn = make_turn(0.5, 3.5, "spk0", [0.9, 0.1], camera="cam2")
+    kept = hard_dedupe([short_turn, long_turn], iou_thresh=0.5, emb_cos_thresh=0.8)
+    assert kept == [long_turn]
+
+
+def test_hard_dedupe_keeps_different_speakers_and_unassigned():
+    a = make_turn(0.0, 4.0, "spk0", [1.0, 0.0])
+    b = make_turn(0.0, 4.0, "spk1", [1.0, 0.0], camera="cam2")
+    c = make_turn(0.0, 4.0, None, [1.0, 0.0], camera="cam3")
+    kept = hard_dedupe([a, b, c], iou_thresh=0.5, emb_cos_thresh=0.8)
+    assert len(kept) == 3
+
+
+def test_hard_dedupe_keeps_dissimilar_embeddings():
+    a = make_turn(0.0, 4.0, "spk0", [1.0, 0.0])
+    b = make_turn(0.0, 4.0, "spk0", [0.0, 1.0], camera="cam2")
+    kept = hard_dedupe([a, b], iou_thresh=0.5, emb_cos_thresh=0.8)
+    assert len(kept) == 2
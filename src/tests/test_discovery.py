@@ -6,50 +6,30 @@ sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 from blink_stitch.helpers import discover_media_paths
 
 
-def create_layout(tmp_path):
-    p = tmp_path
-    (p / "2024-01" / "2024-01-01" / "cam1").mkdir(parents=True)
-    (p / "2024-02" / "2024-02-02").mkdir(parents=True)
-    (p / "day3").mkdir()
-    # create files
-    f1 = p / "2024-01" / "2024-01-01" / "cam1" / "video1.mp4"
-    f1.write_text("dummy")
-    f2 = p / "2024-02" / "2024-02-02" / "video2.MP4"
-    f2.write_text("dummy")
-    f3 = p / "day3" / "video3.mov"
-    f3.write_text("dummy")
-    f4 = p / "some_audio.wav"
-    f4.write_text("dummy")
-    return [f1, f2, f3, f4]
+def test_discover_recursive_all(media_layout):
+    root, files = media_layout
+    found = discover_media_paths([str(root)])
+    assert set(found) == {resolved for _, resolved in files}
 
 
-def test_discover_recursive_all(tmp_path):
-    files = create_layout(tmp_path)
-    found = discover_media_paths([str(tmp_path)])
-    assert set(found) == set(str(p.resolve()) for p in files)
-
-
-def test_discover_non_recursive_top_level(tmp_path):
-    files = create_layout(tmp_path)
-    found = discover_media_paths([str(tmp_path)], recursive=False)
-    expected = {str((tmp_path / "some_audio.wav").resolve())}
+def test_discover_non_recursive_top_level(media_layout):
+    root, files = media_layout
+    found = discover_media_paths([str(root)], recursive=False)
+    expected = {files[3][1]}
     assert set(found) == expected
 
 
-def test_discover_single_file(tmp_path):
-    files = create_layout(tmp_path)
-    single = files[0]
+def test_discover_single_file(media_layout):
+    root, files = media_layout
+    single, resolved = files[0]
     found = discover_media_paths([str(single)])
-    assert found == [str(single.resolve())]
+    assert found == [resolved]
 
 
-def test_discover_extension_case_insensitive(tmp_path):
-    files = create_layout(tmp_path)
-    found = discover_media_paths([str(tmp_path)], recursive=True, exts=[".mp4"])
-    expected = {
-        str((tmp_path / "2024-01" / "2024-01-01" / "cam1" / "video1.mp4").resolve()),
-        str((tmp_path / "2024-02" / "2024-02-02" / "video2.MP4").resolve()),
-    }
+def test_discover_extension_case_insensitive(media_layout):
+    root, files = media_layout
+    found = discover_media_paths([str(root)], recursive=True, exts=[".mp4"])
+    expected = {files[0][1], files[1][1]}
     assert expected.issubset(set(found))
 
 
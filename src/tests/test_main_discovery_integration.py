@@ -1,3 +1,4 @@
+import pytest
 import yaml
 from pathlib import Path
 import sys
@@ -23,28 +24,32 @@ def write_config(path: Path, out_dir: Path):
     cfg = {"output_dir": str(out_dir)}
     path.write_text(yaml.safe_dump(cfg))
 
-def test_discover_input_files_non_recursive(tmp_path):
-    files = create_layout(tmp_path)
-    cfg_path = tmp_path / "cfg.yaml"
-    write_config(cfg_path, tmp_path / "out")
+@pytest.fixture(scope="module")
+def layout(tmp_path_factory):
+    root = tmp_path_factory.mktemp("media")
+    return root, create_layout(root)
 
-    app = BlinkMulticameraStitch(str(cfg_path))
+@pytest.fixture(scope="module")
+def app(tmp_path_factory):
+    # one instance for the module; each test sets the discovery config it needs
+    cfg_path = tmp_path_factory.mktemp("cfg") / "cfg.yaml"
+    write_config(cfg_path, cfg_path.parent / "out")
+    return BlinkMulticameraStitch(str(cfg_path))
+
+def test_discover_input_files_non_recursive(app, layout):
+    root, files = layout
     # simulate CLI mapping: input-path mapped and recursive flag set to False
-    app.config["input_paths"] = [str(tmp_path)]
+    app.config["input_paths"] = [str(root)]
     app.config["recursive_discovery"] = False
 
     found = app._discover_input_files()
     # non-recursive should only find top-level audio1.wav
-    expected = {str((tmp_path / "top" / "audio1.wav").resolve())}
+    expected = {str((root / "top" / "audio1.wav").resolve())}
     assert set(found) == expected
 
-def test_discover_input_files_recursive(tmp_path):
-    files = create_layout(tmp_path)
-    cfg_path = tmp_path / "cfg.yaml"
-    write_config(cfg_path, tmp_path / "out")
-
-    app = BlinkMulticameraStitch(str(cfg_path))
-    app.config["input_paths"] = [str(tmp_path)]
+def test_discover_input_files_recursive(app, layout):
+    root, files = layout
+    app.config["input_paths"] = [str(root)]
     app.config["recursive_discovery"] = True
 
     found = app._discover_input_files()